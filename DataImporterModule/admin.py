@@ -1,3 +1,7 @@
 from django.contrib import admin
+from .models import ImportWatermark, ImportJob, ImportJobTable, ImportFingerprint
 
-# Register your models here.
+admin.site.register(ImportWatermark)
+admin.site.register(ImportJob)
+admin.site.register(ImportJobTable)
+admin.site.register(ImportFingerprint)
@@ -0,0 +1,141 @@
+import os
+import random
+import sqlite3
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from django.db import connection
+
+from .importer import BATCH_SIZE, CHUNK_SIZE, IMPORT_TABLES, run_table
+from .sources import LEGACY_SCHEMA, SqliteSource
+
+FIRST_NAMES = ['Ali', 'Reza', 'Mohammad', 'Sara', 'Maryam', 'Zahra', 'Hossein', 'Fatemeh', 'Amir', 'Neda']
+LAST_NAMES = ['Ahmadi', 'Mohammadi', 'Hosseini', 'Rezaei', 'Karimi', 'Moradi', 'Jafari', 'Rahimi']
+
+
+class QueryCounter:
+    # Counts queries without keeping their SQL, which for blob inserts would distort the memory figures
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def generate_dataset(path, persons, members=None, users=10, shifts=3, roles=5, membership_types=4,
+                     photo_size=20_000, thumbnail_size=2_000, template_size=1_024, visits=None, seed=0):
+    # Writes a SQLite database shaped like the legacy SQL Server tables; blobs are random bytes
+    members = persons if members is None else members
+    visits = members * 3 if visits is None else visits
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+
+    def blob(size):
+        return rng.randbytes(size) if size else None
+
+    def day():
+        return (start + timedelta(days=rng.randrange(3650))).isoformat()
+
+    def clock():
+        return f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}"
+
+    def person(person_id):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        return (
+            person_id, first, last, f"{first} {last}", rng.choice(FIRST_NAMES), rng.randrange(3),
+            f"{rng.randrange(10 ** 10):010d}", None, blob(photo_size), blob(thumbnail_size),
+            f"{rng.randrange(1340, 1395)}/{rng.randrange(1, 13):02d}/{rng.randrange(1, 30):02d}", None,
+            f"09{rng.randrange(10 ** 9):09d}", None, None, None, rng.random() < 0.3, None, None, None, None,
+            False, None, rng.randrange(1, shifts + 1), rng.randrange(1, users + 1), day(), clock(), None, None,
+        )
+
+    def member(member_id):
+        return (
+            member_id, str(100000 + member_id), rng.randrange(1, persons + 1), rng.randrange(1, roles + 1),
+            rng.randrange(1, users + 1), rng.randrange(1, shifts + 1), rng.random() < 0.02, None, True,
+            day(), clock(), None, None, False, None,
+            blob(template_size), blob(template_size), blob(template_size), None,
+            blob(template_size), blob(template_size), blob(template_size), blob(template_size),
+            blob(template_size),
+        )
+
+    def visit(traffic_id):
+        member_id = rng.randrange(1, members + 1)
+        entry_day, entry_hour = day(), rng.randrange(6, 22)
+        # Some visits never recorded an exit
+        exit_time = f"{entry_hour + 1:02d}:{rng.randrange(60):02d}:00" if rng.random() < 0.9 else None
+        return (
+            traffic_id, member_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            entry_day, f"{entry_hour:02d}:{rng.randrange(60):02d}:00", entry_day if exit_time else None, exit_time,
+        )
+
+    rows = {
+        'Gen_Shift': ((i, f"Shift {i}") for i in range(1, shifts + 1)),
+        'Gen_PersonRole': ((i, f"Role {i}") for i in range(1, roles + 1)),
+        'Gen_MembershipType': ((i, f"Membership {i}") for i in range(1, membership_types + 1)),
+        'Sec_Users': (
+            (i, rng.randrange(1, persons + 1), f"user{i}", "secret", i == 1, rng.randrange(1, shifts + 1), True,
+             day(), clock())
+            for i in range(1, users + 1)
+        ),
+        'Gen_Person': (person(i) for i in range(1, persons + 1)),
+        'Gen_Members': (member(i) for i in range(1, members + 1)),
+        'Acc_Traffic': (visit(i) for i in range(1, visits + 1)),
+    }
+
+    if os.path.exists(path):
+        os.remove(path)
+    db = sqlite3.connect(path)
+    try:
+        for table, columns in LEGACY_SCHEMA.items():
+            db.execute(
+                f"CREATE TABLE {table} ("
+                + ", ".join(f"{name} {kind}" for name, kind in columns)
+                + f", PRIMARY KEY ({columns[0][0]}))"
+            )
+            db.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})", rows[table])
+            db.commit()
+    finally:
+        db.close()
+
+
+def benchmark_import(path, stream=False, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, initial_load=False):
+    # Imports every table of a SQLite dataset into the current database and measures each one.
+    # Peak memory is the table's own peak of traced Python allocations (run_table traces streamed runs itself);
+    # the process's resident set cannot tell tables apart, as it keeps the high-water mark of the largest one.
+    # Tracing slows the import down, equally in every run compared.
+    conn = SqliteSource(path).connect()
+    results = []
+    try:
+        for table in IMPORT_TABLES:
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                if not stream:
+                    tracemalloc.start()
+                try:
+                    started = time.perf_counter()
+                    stats = run_table(conn.cursor(), table, batch_size, stream, chunk_size, initial_load=initial_load)
+                    elapsed = time.perf_counter() - started
+                    if not stream:
+                        stats['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+                finally:
+                    if not stream:
+                        tracemalloc.stop()
+            rows = stats['rows']
+            results.append({
+                'table': table.name,
+                'rows': rows,
+                'written': stats['inserted'] + stats['updated'],
+                'unchanged': stats['unchanged'],
+                'skipped': stats['skipped'],
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows / elapsed, 1) if elapsed > 0 else None,
+                'queries': queries.count,
+                'queries_per_row': round(queries.count / rows, 4) if rows else None,
+                'peak_memory_kb': stats['peak_memory_kb'],
+            })
+    finally:
+        conn.close()
+    return results
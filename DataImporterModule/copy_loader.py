@@ -0,0 +1,100 @@
+import io
+
+from django.db import connection
+from django.db.models import BinaryField
+
+from .models import ImportFingerprint
+
+# Initial loads copy the transformed rows into session-local staging tables with COPY and then merge
+# every staging table into its target with a single INSERT ... ON CONFLICT statement. PostgreSQL only.
+
+
+def check_supported():
+    if connection.vendor != 'postgresql':
+        raise ValueError("INITIAL_LOAD requires a PostgreSQL database")
+
+
+def copy_value(value):
+    # One value in COPY text format
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def encode_row(obj, fields, imported=()):
+    # The same values bulk_create would insert: pre_save(add=True), then the database preparation, except that
+    # `imported` fields (auto_now_add ones filled from the legacy rows) keep the object's value.
+    # Binary values are written as-is because their prepared form is a driver adapter.
+    values = []
+    for field in fields:
+        value = getattr(obj, field.attname) if field in imported else field.pre_save(obj, True)
+        if not isinstance(field, BinaryField):
+            value = field.get_db_prep_save(value, connection)
+        values.append(copy_value(value))
+    return '\t'.join(values) + '\n'
+
+
+def stage_name(model):
+    return connection.ops.quote_name(f"import_stage_{model._meta.db_table}")
+
+
+def create_stage(cursor, model, fields):
+    # Only the column types are copied, no constraints or defaults
+    qn = connection.ops.quote_name
+    stage = stage_name(model)
+    columns = ', '.join(qn(f.column) for f in fields)
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} AS SELECT {columns} FROM {qn(model._meta.db_table)} WITH NO DATA")
+    return stage
+
+
+def create_fingerprint_stage(cursor):
+    stage = connection.ops.quote_name("import_stage_fingerprint")
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} (row_id bigint NOT NULL, digest varchar(32) NOT NULL)")
+    return stage
+
+
+def drop_stage(cursor, stage):
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+
+
+def copy_lines(cursor, stage, columns, lines):
+    if not lines:
+        return
+    quoted = ', '.join(connection.ops.quote_name(column) for column in columns)
+    cursor.copy_expert(f"COPY {stage} ({quoted}) FROM STDIN", io.StringIO(''.join(lines)))
+
+
+def merge_stage(cursor, model, stage, fields, key_field, update_fields):
+    # Returns (inserted, written); `xmax = 0` only holds for rows the statement inserted
+    qn = connection.ops.quote_name
+    opts = model._meta
+    columns = ', '.join(qn(f.column) for f in fields)
+    updates = ', '.join(
+        f"{qn(opts.get_field(name).column)} = EXCLUDED.{qn(opts.get_field(name).column)}" for name in update_fields
+    )
+    cursor.execute(f"""
+        WITH merged AS (
+            INSERT INTO {qn(opts.db_table)} ({columns})
+            SELECT {columns} FROM {stage}
+            ON CONFLICT ({qn(opts.get_field(key_field).column)}) DO UPDATE SET {updates}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FROM merged
+    """)
+    inserted, written = cursor.fetchone()
+    return inserted, written
+
+
+def merge_fingerprints(cursor, stage, table_name):
+    qn = connection.ops.quote_name
+    cursor.execute(f"""
+        INSERT INTO {qn(ImportFingerprint._meta.db_table)} ({qn('table')}, row_id, digest)
+        SELECT %s, row_id, digest FROM {stage}
+        ON CONFLICT ({qn('table')}, row_id) DO UPDATE SET digest = EXCLUDED.digest
+    """, [table_name])
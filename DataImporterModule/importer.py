@@ -0,0 +1,708 @@
+import hashlib
+import tracemalloc
+from datetime import date, datetime
+
+from django.db import connection, reset_queries, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from LogModule.models import Log
+from UserModule.biometrics import stamp_merged, stamp_written
+from UserModule.dates import parse_legacy_date, parse_legacy_datetime
+from UserModule.models import (
+    GenMembershipType, GenPersonRole, GenShift,
+    SecUser, GenPerson, GenMember, MemberBiometrics
+)
+from . import copy_loader
+from .models import ImportFingerprint, ImportJob, ImportWatermark
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 500
+
+
+def safe_combine(date_part, time_part):
+    try:
+        if isinstance(date_part, str):
+            date_part = datetime.strptime(date_part, "%Y-%m-%d").date()
+        if isinstance(time_part, str):
+            time_part = datetime.strptime(time_part, "%H:%M:%S").time()
+        return datetime.combine(date_part, time_part)
+    except Exception:
+        return None
+
+
+def as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, str):
+        for fmt in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value.strip(), fmt)
+            except ValueError:
+                continue
+    return None
+
+
+def load_id_map(model):
+    return set(model.objects.values_list('id', flat=True))
+
+
+def pick_id(id_map, value):
+    # Same result as `.filter(id=value).first()`: the id if the target exists, otherwise None
+    return value if value and value in id_map else None
+
+
+class ImportTable:
+    def __init__(self, name, model, query, build, fields, lookups=(),
+                 key_field='id', pk_column=None, modified_column=None, created_columns=None,
+                 depends_on=(), partitioned=False, chunked=False, source=None, finish=None, finish_stage=None,
+                 late_references=None):
+        self.name = name
+        # Legacy table the rows come from, when several import tables read the same one
+        self.source = source or name
+        self.model = model
+        self.query = query
+        self.build = build
+        self.fields = fields
+        self.lookups = lookups
+        # Unique model field holding the legacy key; rows are upserted on it
+        self.key_field = key_field
+        # Tables too large to fetch at once are always read in chunks, even without streaming
+        self.chunked = chunked
+        # Tables that must be fully imported first, and whether key ranges may be imported concurrently
+        self.depends_on = depends_on
+        self.partitioned = partitioned
+        # Legacy columns the incremental watermark is built from
+        self.pk_column = pk_column
+        self.modified_column = modified_column
+        self.created_columns = created_columns
+        # Legacy column -> model attname of references to a table imported after this one. A row whose target
+        # is not there yet is written without it and, like a skipped row, read again by the next incremental run.
+        self.late_references = late_references or {}
+        # Called with the objects written (e.g. to stamp versions) as the last step of the transaction that wrote
+        # them; initial loads instead call finish_stage with the cursor and the staging table once it is merged
+        self.finish = finish
+        self.finish_stage = finish_stage
+
+
+def build_shift(row, id_maps):
+    return GenShift(id=row.ShiftID, shift_desc=row.ShiftDesc)
+
+
+def build_role(row, id_maps):
+    return GenPersonRole(id=row.RoleID, role_desc=row.RoleDesc)
+
+
+def build_membership_type(row, id_maps):
+    return GenMembershipType(id=row.MembershipTypeID, membership_type_desc=row.MembershipTypeDesc)
+
+
+def build_sec_user(row, id_maps):
+    return SecUser(
+        id=row.UserID,
+        username=row.UserName,
+        password=row.UPassword,
+        is_admin=row.IsAdmin,
+        shift_id=pick_id(id_maps[GenShift], row.ShiftID),
+        is_active=row.IsActive,
+        creation_datetime=safe_combine(row.CreationDate, row.CreationTime) or datetime.now(),
+        person_id=pick_id(id_maps[GenPerson], row.PersonID),
+    )
+
+
+def build_person(row, id_maps):
+    return GenPerson(
+        id=row.PersonID,
+        first_name=row.FirstName,
+        last_name=row.LastName,
+        full_name=row.FullName,
+        father_name=row.FatherName,
+        gender={0: 'F', 1: 'M'}.get(row.Gender, 'O'),
+        national_code=row.NationalCode,
+        nidentity=row.Nidentity,
+        person_image=row.PersonImage,
+        thumbnail_image=row.ThumbnailImage,
+        birth_date=parse_legacy_date(row.BirthDate),
+        tel=row.Tel,
+        mobile=row.Mobile,
+        email=row.Email,
+        education=row.Education,
+        job=row.Job,
+        has_insurance=row.HasInsurance,
+        insurance_no=row.InsuranceNo,
+        ins_start_date=parse_legacy_date(row.InsStartDate),
+        ins_end_date=parse_legacy_date(row.InsEndDate),
+        address=row.PAddress,
+        has_parrent=row.HasParrent,
+        team_name=row.TeamName,
+        shift_id=pick_id(id_maps[GenShift], row.ShiftID),
+        user_id=pick_id(id_maps[SecUser], row.UserID),
+        creation_datetime=safe_combine(row.CreationDate, row.CreationTime) or datetime.now(),
+        modifier=row.Modifier,
+        modification_datetime=parse_legacy_datetime(row.ModificationTime),
+        # The photo may have changed; its thumbnails are rebuilt when it is next requested
+        photo_digest=None,
+    )
+
+
+def build_member(row, id_maps):
+    return GenMember(
+        id=row.MemberID,
+        card_no=row.CardNo,
+        person_id=pick_id(id_maps[GenPerson], row.PersonID),
+        role_id=pick_id(id_maps[GenPersonRole], row.RoleID),
+        user_id=pick_id(id_maps[SecUser], row.UserID),
+        shift_id=pick_id(id_maps[GenShift], row.ShiftID),
+        is_black_list=row.IsBlackList,
+        box_radif_no=row.BoxRadifNo,
+        has_finger=row.HasFinger,
+        membership_datetime=parse_legacy_datetime(safe_combine(row.MembershipDate, row.MembershipTime)),
+        modifier=row.Modifier,
+        modification_datetime=parse_legacy_datetime(row.Modificationtime),
+        is_family=row.IsFamily,
+        max_debit=row.MaxDebit,
+        salary=row.Salary,
+    )
+
+
+def build_biometrics(row, id_maps):
+    member_id = pick_id(id_maps[GenMember], row.MemberID)
+    if member_id is None:
+        return None
+    return MemberBiometrics(
+        member_id=member_id,
+        # A placeholder, replaced once the row is written (UserModule.biometrics.stamp_written)
+        version=0,
+        minutiae=row.Minutiae,
+        minutiae2=row.Minutiae2,
+        minutiae3=row.Minutiae3,
+        face_template_1=row.FaceTmpl1,
+        face_template_2=row.FaceTmpl2,
+        face_template_3=row.FaceTmpl3,
+        face_template_4=row.FaceTmpl4,
+        face_template_5=row.FaceTmpl5,
+    )
+
+
+def build_traffic(row, id_maps):
+    # Log.user is required, so visits of members that were not imported (or without a readable entry) are skipped
+    user_id = pick_id(id_maps[GenMember], row.MemberID)
+    entry_time = safe_combine(row.EntryDate, row.EntryTime)
+    if user_id is None or entry_time is None:
+        return None
+    return Log(
+        legacy_id=row.TrafficID,
+        user_id=user_id,
+        full_name=row.PersonName[:200] if row.PersonName else None,
+        # Historical visits are closed; exit_time stays empty when the turnstile never recorded an exit
+        is_online=False,
+        entry_time=entry_time,
+        exit_time=safe_combine(row.ExitDate, row.ExitTime),
+    )
+
+
+# Tables in import order; `lookups` are the FK targets whose ids are loaded once before the table is written.
+# A builder returns None for a row that cannot be imported.
+IMPORT_TABLES = [
+    ImportTable(
+        'Gen_Shift', GenShift,
+        "SELECT ShiftID, ShiftDesc FROM Gen_Shift",
+        build_shift, ['shift_desc'],
+        pk_column='ShiftID',
+    ),
+    ImportTable(
+        'Gen_PersonRole', GenPersonRole,
+        "SELECT RoleID, RoleDesc FROM Gen_PersonRole",
+        build_role, ['role_desc'],
+        pk_column='RoleID',
+    ),
+    ImportTable(
+        'Gen_MembershipType', GenMembershipType,
+        "SELECT MembershipTypeID, MembershipTypeDesc FROM Gen_MembershipType",
+        build_membership_type, ['membership_type_desc'],
+        pk_column='MembershipTypeID',
+    ),
+    ImportTable(
+        'Sec_Users', SecUser,
+        """
+            SELECT UserID, PersonID, UserName, UPassword, IsAdmin, ShiftID,
+                   IsActive, CreationDate, CreationTime
+            FROM Sec_Users
+        """,
+        build_sec_user,
+        ['username', 'password', 'is_admin', 'shift', 'is_active', 'creation_datetime', 'person'],
+        lookups=(GenShift, GenPerson),
+        pk_column='UserID',
+        created_columns=('CreationDate', 'CreationTime'),
+        # Sec_Users.PersonID resolves against people imported by earlier runs, as in the sequential order
+        depends_on=('Gen_Shift',),
+        late_references={'PersonID': 'person_id'},
+    ),
+    ImportTable(
+        'Gen_Person', GenPerson,
+        """
+            SELECT PersonID, FirstName, LastName, FullName, FatherName, Gender, NationalCode,
+                   Nidentity, PersonImage, ThumbnailImage, BirthDate, Tel, Mobile, Email,
+                   Education, Job, HasInsurance, InsuranceNo, InsStartDate, InsEndDate, PAddress,
+                   HasParrent, TeamName, ShiftID, UserID, CreationDate, CreationTime, Modifier, ModificationTime
+            FROM Gen_Person
+        """,
+        build_person,
+        [
+            'first_name', 'last_name', 'full_name', 'father_name', 'gender', 'national_code', 'nidentity',
+            'person_image', 'thumbnail_image', 'birth_date', 'tel', 'mobile', 'email', 'education', 'job',
+            'has_insurance', 'insurance_no', 'ins_start_date', 'ins_end_date', 'address', 'has_parrent',
+            'team_name', 'shift', 'user', 'creation_datetime', 'modifier', 'modification_datetime', 'photo_digest',
+        ],
+        lookups=(GenShift, SecUser),
+        pk_column='PersonID',
+        modified_column='ModificationTime',
+        created_columns=('CreationDate', 'CreationTime'),
+        depends_on=('Gen_Shift', 'Sec_Users'),
+        partitioned=True,
+    ),
+    ImportTable(
+        'Gen_Members', GenMember,
+        """
+            SELECT MemberID, CardNo, PersonID, RoleID, UserID, ShiftID,
+                   IsBlackList, BoxRadifNo, HasFinger, MembershipDate, MembershipTime,
+                   Modifier, Modificationtime, IsFamily, MaxDebit, Salary
+            FROM Gen_Members
+        """,
+        build_member,
+        [
+            'card_no', 'person', 'role', 'user', 'shift', 'is_black_list', 'box_radif_no', 'has_finger',
+            'membership_datetime', 'modifier', 'modification_datetime', 'is_family', 'max_debit', 'salary',
+        ],
+        lookups=(GenPerson, GenPersonRole, SecUser, GenShift),
+        pk_column='MemberID',
+        modified_column='Modificationtime',
+        created_columns=('MembershipDate', 'MembershipTime'),
+        depends_on=('Gen_Shift', 'Gen_PersonRole', 'Sec_Users', 'Gen_Person'),
+        partitioned=True,
+    ),
+    ImportTable(
+        # The templates of Gen_Members, written to their side table with a new version per changed row
+        'Gen_Members_Biometrics', MemberBiometrics,
+        """
+            SELECT MemberID, Modificationtime, MembershipDate, MembershipTime, Minutiae, Minutiae2, Minutiae3,
+                   FaceTmpl1, FaceTmpl2, FaceTmpl3, FaceTmpl4, FaceTmpl5
+            FROM Gen_Members
+        """,
+        build_biometrics,
+        [
+            'minutiae', 'minutiae2', 'minutiae3',
+            'face_template_1', 'face_template_2', 'face_template_3', 'face_template_4', 'face_template_5',
+            'version', 'updated_at',
+        ],
+        lookups=(GenMember,),
+        key_field='member_id',
+        pk_column='MemberID',
+        modified_column='Modificationtime',
+        created_columns=('MembershipDate', 'MembershipTime'),
+        depends_on=('Gen_Members',),
+        partitioned=True,
+        source='Gen_Members',
+        finish=stamp_written,
+        finish_stage=stamp_merged,
+    ),
+    ImportTable(
+        'Acc_Traffic', Log,
+        """
+            SELECT TrafficID, MemberID, PersonName, EntryDate, EntryTime, ExitDate, ExitTime
+            FROM Acc_Traffic
+        """,
+        build_traffic,
+        ['user', 'full_name', 'is_online', 'entry_time', 'exit_time'],
+        lookups=(GenMember,),
+        key_field='legacy_id',
+        pk_column='TrafficID',
+        created_columns=('EntryDate', 'EntryTime'),
+        depends_on=('Gen_Members',),
+        partitioned=True,
+        chunked=True,
+    ),
+]
+
+
+def imported_timestamp_fields(table):
+    # auto_now_add fields whose values come from the legacy rows
+    return [
+        f for f in table.model._meta.concrete_fields
+        if f.name in table.fields and getattr(f, 'auto_now_add', False)
+    ]
+
+
+class RawInsertQuerySet(QuerySet):
+    # Inserts the values the objects hold, as loaddata does: no field's pre_save runs
+    def _insert(self, *args, **kwargs):
+        return super()._insert(*args, raw=True, **kwargs)
+
+
+def bulk_upsert(table, objs, batch_size=BATCH_SIZE):
+    if not objs:
+        return 0
+    # One INSERT ... ON CONFLICT per batch. bulk_create would stamp auto_now_add fields with now(), so every
+    # field but the imported timestamps gets its pre_save value first and the rows are inserted raw.
+    imported = imported_timestamp_fields(table)
+    fields = [f for f in table.model._meta.concrete_fields if f not in imported]
+    for obj in objs:
+        for field in fields:
+            setattr(obj, field.attname, field.pre_save(obj, True))
+    RawInsertQuerySet(table.model).bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=[table.key_field],
+        update_fields=table.fields,
+    )
+    return len(objs)
+
+
+def watermark_clause(table, watermark):
+    # Rows past the watermark: a higher primary key, or a modification/creation time at or after the stored one,
+    # and every row from the lowest one the last run skipped or left unresolved (retry_pk) on.
+    # Boundary rows are read again, which is harmless because the write is an upsert.
+    conditions, params = [], []
+    if watermark.last_pk is not None:
+        conditions.append(f"{table.pk_column} > ?")
+        params.append(watermark.last_pk)
+    if watermark.retry_pk is not None:
+        conditions.append(f"{table.pk_column} >= ?")
+        params.append(watermark.retry_pk)
+    if table.modified_column and watermark.last_modified:
+        conditions.append(f"{table.modified_column} >= ?")
+        params.append(timezone.make_naive(watermark.last_modified))
+    if table.created_columns and watermark.last_created:
+        date_column, time_column = table.created_columns
+        created = timezone.make_naive(watermark.last_created)
+        conditions.append(f"({date_column} > ? OR ({date_column} = ? AND {time_column} >= ?))")
+        params += [created.date(), created.date(), created.time()]
+    if not conditions:
+        return "", []
+    return "(" + " OR ".join(conditions) + ")", params
+
+
+def build_query(table, watermark=None, after_pk=None, key_range=None):
+    # Rows are read in primary key order so a checkpoint is simply the last committed key
+    conditions, params = [], []
+    if watermark is not None:
+        clause, clause_params = watermark_clause(table, watermark)
+        if clause:
+            conditions.append(clause)
+            params += clause_params
+    if key_range is not None:
+        conditions.append(f"{table.pk_column} BETWEEN ? AND ?")
+        params += list(key_range)
+    if after_pk is not None:
+        conditions.append(f"{table.pk_column} > ?")
+        params.append(after_pk)
+    query = table.query.rstrip()
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return f"{query} ORDER BY {table.pk_column}", params
+
+
+def later(current, value):
+    if value is None:
+        return current
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value if current is None or value > current else current
+
+
+def unresolved(table, row, obj):
+    return any(getattr(row, column) and getattr(obj, attname) is None
+               for column, attname in table.late_references.items())
+
+
+def hold_watermark(watermark, pk):
+    if pk is not None and (watermark.retry_pk is None or pk < watermark.retry_pk):
+        watermark.retry_pk = pk
+
+
+def track_watermark(table, watermark, row, obj):
+    # `obj` is what the row was built into; a skipped (None) or unresolved row holds retry_pk at its key
+    pk = getattr(row, table.pk_column)
+    if obj is None or unresolved(table, row, obj):
+        hold_watermark(watermark, pk)
+    if pk is not None and (watermark.last_pk is None or pk > watermark.last_pk):
+        watermark.last_pk = pk
+    if table.modified_column:
+        watermark.last_modified = later(watermark.last_modified, as_datetime(getattr(row, table.modified_column)))
+    if table.created_columns:
+        date_column, time_column = table.created_columns
+        created = safe_combine(getattr(row, date_column), getattr(row, time_column))
+        watermark.last_created = later(watermark.last_created, created)
+
+
+def get_watermark(source, table):
+    watermark = ImportWatermark.objects.filter(source=source, table=table.name).first()
+    return watermark or ImportWatermark(source=source, table=table.name)
+
+
+def merge_watermark(watermark, other):
+    if other.last_pk is not None and (watermark.last_pk is None or other.last_pk > watermark.last_pk):
+        watermark.last_pk = other.last_pk
+    watermark.last_modified = later(watermark.last_modified, other.last_modified)
+    watermark.last_created = later(watermark.last_created, other.last_created)
+    hold_watermark(watermark, other.retry_pk)
+
+
+def key_bounds(cursor, table):
+    cursor.execute(f"SELECT MIN({table.pk_column}), MAX({table.pk_column}) FROM {table.source}")
+    return tuple(cursor.fetchone())
+
+
+def iter_chunks(cursor, chunk_size=None):
+    # Without a chunk size the whole result set is fetched at once
+    if not chunk_size:
+        yield cursor.fetchall()
+        return
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def beat(progress):
+    # Once per chunk read, so a job still comparing or staging rows it has not committed looks alive
+    if progress is not None:
+        ImportJob.objects.filter(pk=progress.job_id, status='running').update(heartbeat=timezone.now())
+
+
+def fingerprint(table, row, obj):
+    # Hash of the legacy row plus the foreign keys it resolved to, so a row whose FK target
+    # appears later is still seen as changed
+    digest = hashlib.blake2b(digest_size=16)
+    values = list(row) + [getattr(obj, f.attname) for f in table.model._meta.concrete_fields
+                          if f.is_relation and f.name in table.fields]
+    for value in values:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            data = bytes(value)
+            digest.update(b'b%d:' % len(data))
+        else:
+            data = repr(value).encode()
+            digest.update(b's%d:' % len(data))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def save_fingerprints(table, digests):
+    ImportFingerprint.objects.bulk_create(
+        [ImportFingerprint(table=table.name, row_id=row_id, digest=digest) for row_id, digest in digests.items()],
+        update_conflicts=True,
+        unique_fields=['table', 'row_id'],
+        update_fields=['digest'],
+    )
+
+
+def add_counts(total, counts):
+    for key, value in counts.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def write_batch(table, rows, id_maps, watermark=None, progress=None, dry_run=False):
+    objs, digests = {}, {}
+    for row in rows:
+        obj = table.build(row, id_maps)
+        if watermark is not None:
+            track_watermark(table, watermark, row, obj)
+        if obj is not None:
+            key = getattr(obj, table.key_field)
+            objs[key] = obj
+            digests[key] = fingerprint(table, row, obj)
+
+    # Only rows that are new, or whose content differs from what was last imported, are written
+    existing = set(
+        table.model.objects.filter(**{f'{table.key_field}__in': digests}).values_list(table.key_field, flat=True)
+    )
+    stored = dict(
+        ImportFingerprint.objects.filter(table=table.name, row_id__in=digests).values_list('row_id', 'digest')
+    )
+    changed = [key for key in objs if key not in existing or stored.get(key) != digests[key]]
+    inserted = sum(1 for key in changed if key not in existing)
+    counts = {
+        'rows': len(rows),
+        'inserted': inserted,
+        'updated': len(changed) - inserted,
+        'unchanged': len(objs) - len(changed),
+        'skipped': len(rows) - len(objs),
+    }
+
+    # The checkpoint is committed together with the rows it covers; a dry run writes no rows, so it sets none
+    with transaction.atomic():
+        if not dry_run:
+            bulk_upsert(table, [objs[key] for key in changed])
+            save_fingerprints(table, {key: digests[key] for key in changed})
+        if progress is not None:
+            progress.advance(counts, None if dry_run else getattr(rows[-1], table.pk_column))
+        if not dry_run and table.finish is not None:
+            table.finish([objs[key] for key in changed])
+    return counts
+
+
+def import_table(table, chunks, batch_size=BATCH_SIZE, watermark=None, progress=None, dry_run=False):
+    id_maps = {model: load_id_map(model) for model in table.lookups}
+    counts = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+    for rows in chunks:
+        beat(progress)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            add_counts(counts, write_batch(table, batch, id_maps, watermark, progress, dry_run))
+        # With DEBUG on, the query log would keep every batch (blobs included) alive until the import ends
+        reset_queries()
+    return counts
+
+
+def copy_import_table(table, chunks, watermark=None, progress=None):
+    # Initial load: chunks are converted exactly as in import_table and copied into a staging table,
+    # which is merged into the target (with its fingerprints) in one transaction once every row is staged
+    id_maps = {model: load_id_map(model) for model in table.lookups}
+    # A model keyed by a legacy column keeps generating its own primary keys
+    fields = [
+        f for f in table.model._meta.concrete_fields
+        if not f.primary_key or table.key_field in (f.name, f.attname)
+    ]
+    imported = imported_timestamp_fields(table)
+    rows_read, skipped, last_pk = 0, 0, None
+    with connection.cursor() as cursor:
+        stage = copy_loader.create_stage(cursor, table.model, fields)
+        fingerprint_stage = copy_loader.create_fingerprint_stage(cursor)
+        try:
+            for rows in chunks:
+                beat(progress)
+                objs, digests = [], []
+                for row in rows:
+                    obj = table.build(row, id_maps)
+                    if watermark is not None:
+                        track_watermark(table, watermark, row, obj)
+                    if obj is None:
+                        skipped += 1
+                        continue
+                    objs.append(obj)
+                    digests.append(f"{getattr(obj, table.key_field)}\t{fingerprint(table, row, obj)}\n")
+                lines = [copy_loader.encode_row(obj, fields, imported) for obj in objs]
+                copy_loader.copy_lines(cursor, stage, [f.column for f in fields], lines)
+                copy_loader.copy_lines(cursor, fingerprint_stage, ['row_id', 'digest'], digests)
+                if rows:
+                    rows_read += len(rows)
+                    last_pk = getattr(rows[-1], table.pk_column)
+                reset_queries()
+
+            with transaction.atomic():
+                inserted, written = copy_loader.merge_stage(
+                    cursor, table.model, stage, fields, table.key_field, table.fields
+                )
+                copy_loader.merge_fingerprints(cursor, fingerprint_stage, table.name)
+                counts = {
+                    'rows': rows_read,
+                    'inserted': inserted,
+                    'updated': written - inserted,
+                    'unchanged': 0,
+                    'skipped': skipped,
+                }
+                if progress is not None and rows_read:
+                    progress.advance(counts, last_pk)
+                if table.finish_stage is not None:
+                    table.finish_stage(cursor, stage)
+        finally:
+            copy_loader.drop_stage(cursor, stage)
+            copy_loader.drop_stage(cursor, fingerprint_stage)
+    return counts
+
+
+def start_progress(job, table, key_range=None):
+    progress, _ = job.tables.get_or_create(
+        table=table.name,
+        range_start=key_range[0] if key_range else None,
+        defaults={'range_end': key_range[1] if key_range else None},
+    )
+    if progress.status != 'completed':
+        if progress.checkpoint is None:
+            # Nothing was committed (or it was a dry run), so the table is read and counted again from the start
+            progress.rows_read = progress.rows_written = progress.rows_inserted = progress.rows_updated = 0
+            progress.rows_unchanged = progress.rows_skipped = 0
+        progress.status = 'running'
+        progress.started_at = progress.started_at or timezone.now()
+        progress.save(update_fields=[
+            'status', 'started_at', 'rows_read', 'rows_written', 'rows_inserted', 'rows_updated', 'rows_unchanged',
+            'rows_skipped', 'updated_at',
+        ])
+    return progress
+
+
+def run_table(cursor, table, batch_size=BATCH_SIZE, stream=False, chunk_size=CHUNK_SIZE, watermark=None,
+              incremental=False, job=None, key_range=None, dry_run=False, initial_load=False):
+    # Imports one table, or one key range of it, and returns its stats.
+    # The watermark is advanced in memory; saving it is left to the caller.
+    # A dry run reads and compares everything but writes nothing.
+    # An initial load (PostgreSQL only) stages the rows with COPY and merges them in one statement;
+    # it is always read in chunks, and a table that fails is staged again from the start.
+    copy_load = initial_load and not dry_run
+    if copy_load:
+        copy_loader.check_supported()
+    progress = start_progress(job, table, key_range) if job is not None else None
+    if progress is not None and progress.status == 'completed':
+        return progress.counts()
+    if stream:
+        tracemalloc.start()
+    try:
+        query, params = build_query(
+            table,
+            watermark if incremental and watermark is not None and watermark.pk else None,
+            progress.checkpoint if progress is not None else None,
+            key_range,
+        )
+        if watermark is not None:
+            # retry_pk is rebuilt from the rows read now. Rows a resumed run read before its checkpoint are not
+            # read again, so their whole range is retried next time.
+            if progress is not None and progress.checkpoint is not None:
+                hold_watermark(watermark, key_range[0] if key_range else key_bounds(cursor, table)[0])
+            else:
+                watermark.retry_pk = None
+        cursor.execute(query, *params)
+        if copy_load:
+            counts = copy_import_table(table, iter_chunks(cursor, chunk_size), watermark, progress)
+        else:
+            chunks = iter_chunks(cursor, chunk_size if stream or table.chunked else None)
+            counts = import_table(table, chunks, batch_size, watermark, progress, dry_run)
+        stats = progress.counts() if progress is not None else counts
+        if stream:
+            stats['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+    except Exception:
+        if progress is not None:
+            progress.status = 'failed'
+            progress.save(update_fields=['status', 'updated_at'])
+        raise
+    finally:
+        if stream:
+            tracemalloc.stop()
+    if progress is not None:
+        progress.status = 'completed'
+        progress.finished_at = timezone.now()
+        progress.peak_memory_kb = stats.get('peak_memory_kb')
+        progress.save(update_fields=['status', 'finished_at', 'peak_memory_kb', 'updated_at'])
+    return stats
+
+
+def run_import(cursor, batch_size=BATCH_SIZE, stream=False, chunk_size=CHUNK_SIZE, source=None, incremental=False,
+               job=None, dry_run=False, initial_load=False):
+    # In streaming mode each chunk is written before the next one is fetched,
+    # and the peak Python memory of every table is reported.
+    # When a source is given, every run stores per-table watermarks; incremental runs only read rows past them.
+    # With a job, progress is recorded per table and a resumed job skips finished tables and committed batches.
+    stats = {}
+    for table in IMPORT_TABLES:
+        watermark = get_watermark(source, table) if source else None
+        stats[table.name] = run_table(
+            cursor, table, batch_size, stream, chunk_size, watermark, incremental, job,
+            dry_run=dry_run, initial_load=initial_load,
+        )
+        if watermark is not None and not dry_run:
+            watermark.save()
+    return stats
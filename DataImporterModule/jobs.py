@@ -0,0 +1,112 @@
+import threading
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from UserModule.access import forget_cards
+from UserModule.biometrics import sync_blocked
+from UserModule.reference import forget_references
+from .importer import CHUNK_SIZE, run_import
+from .models import ImportJob
+from .parallel import run_parallel_import
+from .sources import source_from_config
+
+# A running job's heartbeat is touched per chunk read (importer.beat) and, for single statements that take
+# long (a fetchall, a COPY merge), every HEARTBEAT_INTERVAL while its thread lives. A job without a heartbeat
+# for STALE_AFTER is treated as dead and may be resumed.
+HEARTBEAT_INTERVAL = timedelta(minutes=1)
+STALE_AFTER = timedelta(minutes=10)
+
+
+def is_stale(job):
+    return job.status == 'running' and timezone.now() - (job.heartbeat or job.updated_at) > STALE_AFTER
+
+
+def is_resumable(job):
+    return job.status == 'failed' or is_stale(job)
+
+
+def stale_jobs():
+    return ImportJob.objects.filter(status='running', heartbeat__lt=timezone.now() - STALE_AFTER)
+
+
+def abandon_stale_jobs(source):
+    # Marks the dead jobs of a source failed (they stay resumable), so a new job may take its place
+    now = timezone.now()
+    stale_jobs().filter(source=source).update(
+        status='failed', error='No heartbeat; the import was interrupted', finished_at=now, updated_at=now,
+    )
+
+
+def keep_alive(job_id, done):
+    while not done.wait(HEARTBEAT_INTERVAL.total_seconds()):
+        ImportJob.objects.filter(id=job_id, status='running').update(heartbeat=timezone.now())
+    connection.close()
+
+
+def run_job(job_id):
+    job = ImportJob.objects.get(id=job_id)
+    done = threading.Event()
+    threading.Thread(target=keep_alive, args=(job_id, done), daemon=True).start()
+
+    try:
+        config = job.config
+        conn = source_from_config(config).connect()
+        try:
+            if config.get('WORKERS', 1) > 1:
+                run_parallel_import(conn.cursor(), job, config['WORKERS'])
+            else:
+                run_import(
+                    conn.cursor(),
+                    stream=config.get('STREAM', False),
+                    chunk_size=config.get('CHUNK_SIZE', CHUNK_SIZE),
+                    source=job.source,
+                    incremental=config.get('INCREMENTAL', False),
+                    job=job,
+                    dry_run=config.get('DRY_RUN', False),
+                    initial_load=config.get('INITIAL_LOAD', False),
+                )
+        finally:
+            conn.close()
+        # Members the import blacklisted or cleared get new template versions (bulk writes send no signals)
+        sync_blocked()
+        job.status = 'completed'
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    finally:
+        done.set()
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        # Bulk writes send no signals, so cached card lookups and lookup-table responses are dropped here
+        forget_cards()
+        forget_references()
+        # The worker thread has its own database connection
+        connection.close()
+
+
+def claim_job(job):
+    # Marks a pending, failed or stale job running with one conditional update. Returns False when the job is
+    # not in one of those states (e.g. another request claimed it first) or another job of its source is active.
+    now = timezone.now()
+    claimable = Q(status__in=['pending', 'failed']) | Q(pk__in=stale_jobs().values('pk'))
+    try:
+        with transaction.atomic():
+            claimed = ImportJob.objects.filter(claimable, pk=job.pk).update(
+                status='running', error=None, started_at=Coalesce('started_at', Value(now)), finished_at=None,
+                heartbeat=now, updated_at=now,
+            )
+    except IntegrityError:
+        return False
+    return claimed == 1
+
+
+def start_job(job):
+    # Runs the job on a thread if this request claims it
+    if not claim_job(job):
+        return False
+    threading.Thread(target=run_job, args=(job.id,), daemon=True).start()
+    return True
@@ -0,0 +1,79 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DataImporterModule.benchmark import benchmark_import
+from DataImporterModule.importer import BATCH_SIZE, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a synthetic legacy dataset into the configured database and report rows/sec, queries per row, "
+        "peak memory and time per table. Run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="SQLite dataset from generate_legacy_dataset")
+        parser.add_argument('--stream', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--initial-load', action='store_true', help="Use the COPY path (PostgreSQL only)")
+        parser.add_argument('--passes', type=int, default=1, help="Repeat the import to also measure re-imports")
+        parser.add_argument('--json', dest='output', help="Write the results to this file")
+        parser.add_argument('--baseline', help="Results file of an earlier run to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed slowdown or growth against the baseline before failing (0.2 = 20%%)")
+
+    def handle(self, *args, **options):
+        runs = []
+        for number in range(1, options['passes'] + 1):
+            results = benchmark_import(
+                options['path'],
+                stream=options['stream'],
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+                initial_load=options['initial_load'],
+            )
+            runs.append(results)
+            self.stdout.write(f"Pass {number}")
+            self.stdout.write(f"{'table':<20}{'rows':>10}{'written':>10}{'seconds':>10}{'rows/s':>12}{'queries':>10}"
+                              f"{'q/row':>10}{'peak kB':>10}")
+            for r in results:
+                self.stdout.write(
+                    f"{r['table']:<20}{r['rows']:>10}{r['written']:>10}{r['seconds']:>10}{r['rows_per_second'] or '-':>12}"
+                    f"{r['queries']:>10}{r['queries_per_row'] or '-':>10}{r['peak_memory_kb'] or '-':>10}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(runs, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare(baseline, runs, options['tolerance'])
+            if regressions:
+                raise CommandError("Import performance regressed:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+
+def compare(baseline, runs, tolerance):
+    regressions = []
+    for number, (old_run, new_run) in enumerate(zip(baseline, runs), start=1):
+        old_tables = {r['table']: r for r in old_run}
+        for new in new_run:
+            old = old_tables.get(new['table'])
+            if not old or not old['rows_per_second'] or not new['rows_per_second']:
+                continue
+            if new['rows_per_second'] < old['rows_per_second'] * (1 - tolerance):
+                regressions.append(f"pass {number} {new['table']}: "
+                                   f"{old['rows_per_second']} -> {new['rows_per_second']} rows/s")
+            if old['queries_per_row'] and new['queries_per_row'] \
+                    and new['queries_per_row'] > old['queries_per_row'] * (1 + tolerance):
+                regressions.append(f"pass {number} {new['table']}: "
+                                   f"{old['queries_per_row']} -> {new['queries_per_row']} queries/row")
+            if old.get('peak_memory_kb') and new['peak_memory_kb'] \
+                    and new['peak_memory_kb'] > old['peak_memory_kb'] * (1 + tolerance):
+                regressions.append(f"pass {number} {new['table']}: "
+                                   f"{old['peak_memory_kb']} -> {new['peak_memory_kb']} peak kB")
+    return regressions
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from DataImporterModule.benchmark import generate_dataset
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic legacy dataset (SQLite) for import benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--persons', type=int, default=10_000)
+        parser.add_argument('--members', type=int, help="Defaults to --persons")
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--photo-size', type=int, default=20_000, help="PersonImage bytes")
+        parser.add_argument('--thumbnail-size', type=int, default=2_000, help="ThumbnailImage bytes")
+        parser.add_argument('--template-size', type=int, default=1_024, help="Bytes per Minutiae/FaceTmpl column")
+        parser.add_argument('--visits', type=int, help="Acc_Traffic rows; defaults to three per member")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generate_dataset(
+            options['path'],
+            persons=options['persons'],
+            members=options['members'],
+            users=options['users'],
+            photo_size=options['photo_size'],
+            thumbnail_size=options['thumbnail_size'],
+            template_size=options['template_size'],
+            visits=options['visits'],
+            seed=options['seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['path']}"))
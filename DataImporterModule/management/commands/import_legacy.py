@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from DataImporterModule.importer import CHUNK_SIZE
+from DataImporterModule.jobs import abandon_stale_jobs, claim_job, run_job
+from DataImporterModule.models import ImportJob
+from DataImporterModule.serializers import ImportJobSerializer
+from DataImporterModule.sources import source_from_config
+
+
+class Command(BaseCommand):
+    help = "Run a legacy import in the foreground, e.g. from a SQLite or JSONL/CSV snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='odbc', choices=['odbc', 'sqlite', 'jsonl', 'csv'])
+        parser.add_argument('--server')
+        parser.add_argument('--database')
+        parser.add_argument('--path', help="SQLite file, or directory of <Table>.jsonl/.csv dumps")
+        parser.add_argument('--stream', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--incremental', action='store_true')
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report inserts/updates/unchanged rows per table")
+        parser.add_argument('--initial-load', action='store_true',
+                            help="Stage rows with COPY and merge each table in one statement (PostgreSQL)")
+
+    def handle(self, *args, **options):
+        config = {
+            'SOURCE': options['source'],
+            'SERVER': options['server'],
+            'DATABASE': options['database'],
+            'PATH': options['path'],
+            'STREAM': options['stream'],
+            'CHUNK_SIZE': options['chunk_size'],
+            'INCREMENTAL': options['incremental'],
+            'WORKERS': options['workers'],
+            'DRY_RUN': options['dry_run'],
+            'INITIAL_LOAD': options['initial_load'],
+        }
+        try:
+            source = source_from_config(config)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        abandon_stale_jobs(source.key)
+        try:
+            with transaction.atomic():
+                job = ImportJob.objects.create(source=source.key, config=config)
+        except IntegrityError:
+            raise CommandError("An import from this source is already running")
+        if not claim_job(job):
+            raise CommandError("An import from this source is already running")
+        run_job(job.id)
+        job.refresh_from_db()
+
+        self.stdout.write(json.dumps(ImportJobSerializer(job).data, indent=2, default=str))
+        if job.status != 'completed':
+            raise CommandError(f"Import job {job.id} {job.status}: {job.error}")
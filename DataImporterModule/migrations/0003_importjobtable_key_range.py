@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataImporterModule', '0002_importjob_importjobtable'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='importjobtable',
+            name='unique_import_job_table',
+        ),
+        migrations.AddField(
+            model_name='importjobtable',
+            name='range_end',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjobtable',
+            name='range_start',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='importjobtable',
+            constraint=models.UniqueConstraint(fields=('job', 'table', 'range_start'), name='unique_import_job_table'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataImporterModule', '0003_importjobtable_key_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjobtable',
+            name='rows_inserted',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjobtable',
+            name='rows_unchanged',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importjobtable',
+            name='rows_updated',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100)),
+                ('row_id', models.BigIntegerField()),
+                ('digest', models.CharField(max_length=32)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('table', 'row_id'), name='unique_import_fingerprint')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataImporterModule', '0004_importfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjobtable',
+            name='rows_skipped',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def prepare_jobs(apps, schema_editor):
+    # Running jobs start from their last update; of several active jobs of one source only the newest stays
+    ImportJob = apps.get_model('DataImporterModule', 'ImportJob')
+    ImportJob.objects.filter(status='running').update(heartbeat=F('updated_at'))
+    newest = {}
+    for job_id, source in ImportJob.objects.filter(status__in=['pending', 'running']).order_by('id') \
+            .values_list('id', 'source'):
+        newest[source] = job_id
+    ImportJob.objects.filter(status__in=['pending', 'running']).exclude(id__in=newest.values()).update(
+        status='failed', error='Superseded by a newer job',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataImporterModule', '0005_importjobtable_rows_skipped'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(prepare_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='importjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('source',), name='unique_active_import_job'),
+        ),
+    ]
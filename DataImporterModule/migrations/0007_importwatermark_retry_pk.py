@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+def retry_everything(apps, schema_editor):
+    # Earlier runs moved past rows they skipped or left unresolved; the next incremental run reads them all again
+    ImportWatermark = apps.get_model('DataImporterModule', 'ImportWatermark')
+    ImportWatermark.objects.filter(last_pk__isnull=False).update(retry_pk=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DataImporterModule', '0006_importjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importwatermark',
+            name='retry_pk',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(retry_everything, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,129 @@
 from django.db import models
+from django.utils.timezone import now
 
-# Create your models here.
+
+class ImportWatermark(models.Model):
+    source = models.CharField(max_length=255)
+    table = models.CharField(max_length=100)
+    last_pk = models.BigIntegerField(null=True, blank=True)
+    last_modified = models.DateTimeField(null=True, blank=True)
+    last_created = models.DateTimeField(null=True, blank=True)
+    # Lowest key of a row the last run skipped or left unresolved; incremental runs read every row from it on
+    retry_pk = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'table'], name='unique_import_watermark'),
+        ]
+
+    def __str__(self):
+        return f"{self.source} {self.table} (pk > {self.last_pk})"
+
+
+class ImportJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    source = models.CharField(max_length=255)
+    config = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Touched regularly while the job's run is alive, whether or not it commits anything
+    heartbeat = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One active job per source; a second request to import it is refused
+            models.UniqueConstraint(
+                fields=['source'], condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_import_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Import {self.id} from {self.source} - {self.status}"
+
+
+class ImportJobTable(models.Model):
+    job = models.ForeignKey(ImportJob, on_delete=models.CASCADE, related_name='tables')
+    table = models.CharField(max_length=100)
+    # Legacy key range of a partition imported by a parallel job; empty for a whole table
+    range_start = models.BigIntegerField(null=True, blank=True)
+    range_end = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=ImportJob.STATUS_CHOICES, default='pending')
+    rows_read = models.BigIntegerField(default=0)
+    rows_written = models.BigIntegerField(default=0)
+    rows_inserted = models.BigIntegerField(default=0)
+    rows_updated = models.BigIntegerField(default=0)
+    rows_unchanged = models.BigIntegerField(default=0)
+    rows_skipped = models.BigIntegerField(default=0)  # Rows that cannot be imported, e.g. visits of unknown members
+    checkpoint = models.BigIntegerField(null=True, blank=True)  # Legacy primary key of the last committed batch
+    peak_memory_kb = models.BigIntegerField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'table', 'range_start'], name='unique_import_job_table'),
+        ]
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return None
+        elapsed = ((self.finished_at or now()) - self.started_at).total_seconds()
+        return round(self.rows_read / elapsed, 1) if elapsed > 0 else None
+
+    def counts(self):
+        return {
+            'rows': self.rows_read,
+            'inserted': self.rows_inserted,
+            'updated': self.rows_updated,
+            'unchanged': self.rows_unchanged,
+            'skipped': self.rows_skipped,
+        }
+
+    def advance(self, counts, checkpoint=None):
+        # Without a checkpoint (a dry run commits no rows) only the counts move, and a resumed job reads from the start
+        self.rows_read += counts['rows']
+        self.rows_inserted += counts['inserted']
+        self.rows_updated += counts['updated']
+        self.rows_unchanged += counts['unchanged']
+        self.rows_skipped += counts['skipped']
+        self.rows_written = self.rows_inserted + self.rows_updated
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+        self.save(update_fields=[
+            'rows_read', 'rows_written', 'rows_inserted', 'rows_updated', 'rows_unchanged', 'rows_skipped',
+            'checkpoint', 'updated_at',
+        ])
+
+    def __str__(self):
+        if self.range_start is not None:
+            return f"{self.table} [{self.range_start}-{self.range_end}] ({self.status})"
+        return f"{self.table} ({self.status})"
+
+
+class ImportFingerprint(models.Model):
+    # Content hash of the legacy row last written for `row_id`, used to skip unchanged rows
+    table = models.CharField(max_length=100)
+    row_id = models.BigIntegerField()
+    digest = models.CharField(max_length=32)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['table', 'row_id'], name='unique_import_fingerprint'),
+        ]
+
+    def __str__(self):
+        return f"{self.table} {self.row_id}: {self.digest}"
@@ -0,0 +1,146 @@
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.db import connections
+
+# Workers are spawned rather than forked: the scheduler runs on a job thread of a web process,
+# and forking a threaded process with open database connections is unsafe.
+# Django (and with it the models) is only loaded inside the functions for the same reason.
+
+
+def init_worker():
+    django.setup()
+
+
+def split_range(low, high, parts):
+    step = max(1, -(-(high - low + 1) // parts))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def plan_ranges(cursor, job, table, workers):
+    # Reuse the partitions of an interrupted run so its checkpoints stay valid
+    from .importer import key_bounds
+
+    if not table.partitioned or workers < 2:
+        return [None]
+    existing = job.tables.filter(table=table.name, range_start__isnull=False).order_by('range_start')
+    if existing:
+        return [(p.range_start, p.range_end) for p in existing]
+    low, high = key_bounds(cursor, table)
+    if low is None:
+        return [None]
+    return split_range(low, high, workers)
+
+
+def dependency_order(tables):
+    names = {table.name for table in tables}
+    ordered, done = [], set()
+    while len(ordered) < len(tables):
+        ready = [t for t in tables if t.name not in done and all(d in done for d in t.depends_on if d in names)]
+        if not ready:
+            raise ValueError("Import tables have a dependency cycle")
+        for table in ready:
+            ordered.append(table)
+            done.add(table.name)
+    return ordered
+
+
+def run_task(job_id, table_name, key_range, watermark_values):
+    # Runs in a worker process with its own database and ODBC connections
+    from .importer import IMPORT_TABLES, run_table
+    from .models import ImportJob, ImportWatermark
+    from .sources import source_from_config
+
+    job = ImportJob.objects.get(id=job_id)
+    table = next(t for t in IMPORT_TABLES if t.name == table_name)
+    config = job.config
+    watermark = ImportWatermark(source=job.source, table=table.name, **watermark_values)
+
+    conn = source_from_config(config).connect()
+    try:
+        stats = run_table(
+            conn.cursor(), table,
+            stream=config.get('STREAM', False),
+            chunk_size=config['CHUNK_SIZE'],
+            watermark=watermark,
+            incremental=config.get('INCREMENTAL', False),
+            job=job,
+            key_range=key_range,
+            dry_run=config.get('DRY_RUN', False),
+            initial_load=config.get('INITIAL_LOAD', False),
+        )
+    finally:
+        conn.close()
+        connections.close_all()
+
+    return stats, {
+        'last_pk': watermark.last_pk,
+        'last_modified': watermark.last_modified,
+        'last_created': watermark.last_created,
+        'retry_pk': watermark.retry_pk,
+    }
+
+
+def run_parallel_import(cursor, job, workers):
+    # Tables start as soon as everything they depend on is imported; partitioned tables
+    # are split into key ranges that are imported side by side.
+    from .importer import IMPORT_TABLES, add_counts, get_watermark, merge_watermark
+    from .models import ImportWatermark
+
+    tables = dependency_order(IMPORT_TABLES)
+    ranges = {table.name: plan_ranges(cursor, job, table, workers) for table in tables}
+    watermarks = {table.name: get_watermark(job.source, table) for table in tables}
+
+    # Every worker task sees the watermarks as they were when the job started
+    snapshots = {
+        name: {
+            'id': watermark.id,
+            'last_pk': watermark.last_pk,
+            'last_modified': watermark.last_modified,
+            'last_created': watermark.last_created,
+            'retry_pk': watermark.retry_pk,
+        }
+        for name, watermark in watermarks.items()
+    }
+    # Each key range rebuilds retry_pk for its own rows; the table's is the lowest of them
+    for watermark in watermarks.values():
+        watermark.retry_pk = None
+
+    stats, remaining, done, submitted, pending = {}, {}, set(), set(), {}
+    connections.close_all()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker) as pool:
+        def submit_ready():
+            for table in tables:
+                if table.name in submitted or not all(d in done for d in table.depends_on):
+                    continue
+                submitted.add(table.name)
+                remaining[table.name] = len(ranges[table.name])
+                for key_range in ranges[table.name]:
+                    future = pool.submit(run_task, job.id, table.name, key_range, snapshots[table.name])
+                    pending[future] = table.name
+
+        submit_ready()
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = pending.pop(future)
+                try:
+                    task_stats, values = future.result()
+                except Exception:
+                    for other in pending:
+                        other.cancel()
+                    raise
+                peak = task_stats.pop('peak_memory_kb', None)
+                table_stats = add_counts(stats.setdefault(name, {}), task_stats)
+                if peak is not None:
+                    table_stats['peak_memory_kb'] = max(table_stats.get('peak_memory_kb', 0), peak)
+                merge_watermark(watermarks[name], ImportWatermark(**values))
+                remaining[name] -= 1
+                if not remaining[name]:
+                    if not job.config.get('DRY_RUN'):
+                        watermarks[name].save()
+                    done.add(name)
+            submit_ready()
+    return stats
@@ -0,0 +1,25 @@
+from rest_framework import serializers
+from .models import ImportJob, ImportJobTable
+
+
+class ImportJobTableSerializer(serializers.ModelSerializer):
+    rows_per_second = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJobTable
+        fields = [
+            'table', 'range_start', 'range_end', 'status', 'rows_read', 'rows_written', 'rows_inserted',
+            'rows_updated', 'rows_unchanged', 'rows_skipped', 'rows_per_second', 'checkpoint', 'peak_memory_kb',
+            'started_at', 'finished_at', 'updated_at'
+        ]
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    tables = ImportJobTableSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'source', 'config', 'status', 'error', 'created_at', 'started_at', 'finished_at', 'updated_at',
+            'tables'
+        ]
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save
+
+from UserModule.signals import bulk_saved
+from .importer import IMPORT_TABLES
+from .models import ImportFingerprint
+
+
+def forget_fingerprint(sender, instance, **kwargs):
+    # A row edited or deleted locally no longer matches its fingerprint; the next import writes it again.
+    # Rows without a legacy key (e.g. visits logged here) were never imported and have none.
+    for table in IMPORT_TABLES:
+        if table.model is sender:
+            row_id = getattr(instance, table.key_field)
+            if row_id is not None:
+                ImportFingerprint.objects.filter(table=table.name, row_id=row_id).delete()
+
+
+def forget_fingerprints(sender, ids, **kwargs):
+    for table in IMPORT_TABLES:
+        if table.model is sender and table.key_field in ('id', sender._meta.pk.attname):
+            ImportFingerprint.objects.filter(table=table.name, row_id__in=ids).delete()
+
+
+def connect_signals():
+    for table in IMPORT_TABLES:
+        post_save.connect(forget_fingerprint, sender=table.model, dispatch_uid=f'fingerprint-save-{table.name}')
+        post_delete.connect(forget_fingerprint, sender=table.model, dispatch_uid=f'fingerprint-delete-{table.name}')
+        bulk_saved.connect(forget_fingerprints, sender=table.model, dispatch_uid=f'fingerprint-bulk-{table.name}')
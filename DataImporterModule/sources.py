@@ -0,0 +1,230 @@
+import base64
+import csv
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import date, datetime, time
+
+import pyodbc
+
+# Column types of the legacy tables, used to rebuild them from file dumps
+LEGACY_SCHEMA = {
+    'Gen_Shift': [
+        ('ShiftID', 'INTEGER'), ('ShiftDesc', 'TEXT'),
+    ],
+    'Gen_PersonRole': [
+        ('RoleID', 'INTEGER'), ('RoleDesc', 'TEXT'),
+    ],
+    'Gen_MembershipType': [
+        ('MembershipTypeID', 'INTEGER'), ('MembershipTypeDesc', 'TEXT'),
+    ],
+    'Sec_Users': [
+        ('UserID', 'INTEGER'), ('PersonID', 'INTEGER'), ('UserName', 'TEXT'), ('UPassword', 'TEXT'),
+        ('IsAdmin', 'BIT'), ('ShiftID', 'INTEGER'), ('IsActive', 'BIT'), ('CreationDate', 'TEXT'),
+        ('CreationTime', 'TEXT'),
+    ],
+    'Gen_Person': [
+        ('PersonID', 'INTEGER'), ('FirstName', 'TEXT'), ('LastName', 'TEXT'), ('FullName', 'TEXT'),
+        ('FatherName', 'TEXT'), ('Gender', 'INTEGER'), ('NationalCode', 'TEXT'), ('Nidentity', 'TEXT'),
+        ('PersonImage', 'BLOB'), ('ThumbnailImage', 'BLOB'), ('BirthDate', 'TEXT'), ('Tel', 'TEXT'),
+        ('Mobile', 'TEXT'), ('Email', 'TEXT'), ('Education', 'TEXT'), ('Job', 'TEXT'), ('HasInsurance', 'BIT'),
+        ('InsuranceNo', 'TEXT'), ('InsStartDate', 'TEXT'), ('InsEndDate', 'TEXT'), ('PAddress', 'TEXT'),
+        ('HasParrent', 'BIT'), ('TeamName', 'TEXT'), ('ShiftID', 'INTEGER'), ('UserID', 'INTEGER'),
+        ('CreationDate', 'TEXT'), ('CreationTime', 'TEXT'), ('Modifier', 'TEXT'), ('ModificationTime', 'TEXT'),
+    ],
+    'Gen_Members': [
+        ('MemberID', 'INTEGER'), ('CardNo', 'TEXT'), ('PersonID', 'INTEGER'), ('RoleID', 'INTEGER'),
+        ('UserID', 'INTEGER'), ('ShiftID', 'INTEGER'), ('IsBlackList', 'BIT'), ('BoxRadifNo', 'TEXT'),
+        ('HasFinger', 'BIT'), ('MembershipDate', 'TEXT'), ('MembershipTime', 'TEXT'), ('Modifier', 'TEXT'),
+        ('Modificationtime', 'TEXT'), ('IsFamily', 'BIT'), ('MaxDebit', 'REAL'), ('Minutiae', 'BLOB'),
+        ('Minutiae2', 'BLOB'), ('Minutiae3', 'BLOB'), ('Salary', 'REAL'), ('FaceTmpl1', 'BLOB'),
+        ('FaceTmpl2', 'BLOB'), ('FaceTmpl3', 'BLOB'), ('FaceTmpl4', 'BLOB'), ('FaceTmpl5', 'BLOB'),
+    ],
+    'Acc_Traffic': [
+        ('TrafficID', 'INTEGER'), ('MemberID', 'INTEGER'), ('PersonName', 'TEXT'), ('EntryDate', 'TEXT'),
+        ('EntryTime', 'TEXT'), ('ExitDate', 'TEXT'), ('ExitTime', 'TEXT'),
+    ],
+}
+
+
+class LegacySource:
+    # A place the legacy tables are read from. connect() returns an object with cursor() and close();
+    # cursors follow pyodbc: execute(sql, *params) with `?` placeholders, fetchone/fetchmany/fetchall,
+    # and rows whose columns are attributes.
+    key = None
+
+    def connect(self):
+        raise NotImplementedError
+
+
+class OdbcSource(LegacySource):
+    def __init__(self, server, database):
+        self.server = server
+        self.database = database
+        self.key = f"{server}/{database}"
+
+    def connect(self):
+        return pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={self.server};"
+            f"DATABASE={self.database};"
+            "Trusted_Connection=yes;"
+        )
+
+
+def sqlite_param(value):
+    # SQLite copies and dump caches hold dates, times and datetimes as ISO text (2024-01-31, 08:30:00,
+    # 2024-01-31 08:30:00), which compares in order; sqlite3 cannot bind a time at all
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return value
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.row_class = None
+
+    def execute(self, sql, *params):
+        self.cursor.execute(sql, [sqlite_param(value) for value in params])
+        names = [column[0] for column in self.cursor.description]
+        self.row_class = namedtuple('Row', names, rename=True)
+        return self
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return self.row_class(*row) if row is not None else None
+
+    def fetchmany(self, size):
+        return [self.row_class(*row) for row in self.cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self.row_class(*row) for row in self.cursor.fetchall()]
+
+
+class SqliteConnection:
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+
+    def cursor(self):
+        return SqliteCursor(self.connection.cursor())
+
+    def close(self):
+        self.connection.close()
+
+
+class SqliteSource(LegacySource):
+    # A SQLite copy of the legacy database, with the same table and column names
+    def __init__(self, path):
+        self.path = path
+        self.key = f"sqlite:{os.path.abspath(path)}"
+
+    def connect(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No SQLite database at {self.path}")
+        return SqliteConnection(self.path)
+
+
+def convert_dump_value(value, column_type):
+    # Dumps hold blobs as base64 and may hold every value as text (CSV)
+    if value is None or value == '':
+        return None
+    if column_type == 'BLOB':
+        return base64.b64decode(value)
+    if column_type == 'BIT':
+        if isinstance(value, str):
+            return value.strip().lower() in ('1', 'true', 't', 'yes')
+        return bool(value)
+    if column_type == 'INTEGER':
+        return int(value)
+    if column_type == 'REAL':
+        return float(value)
+    return value
+
+
+class DumpSource(LegacySource):
+    # A directory of per-table dumps (Gen_Person.jsonl or Gen_Person.csv, ...). The dumps are loaded once into
+    # a SQLite file next to them, which is then read like SqliteSource; it is rebuilt when a dump changes.
+    FORMATS = ('jsonl', 'csv')
+    CACHE_NAME = '.legacy.sqlite3'
+
+    def __init__(self, directory, file_format):
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unsupported dump format: {file_format}")
+        self.directory = directory
+        self.file_format = file_format
+        self.key = f"{file_format}:{os.path.abspath(directory)}"
+
+    def dump_path(self, table):
+        return os.path.join(self.directory, f"{table}.{self.file_format}")
+
+    def read_dump(self, table):
+        with open(self.dump_path(table), encoding='utf-8', newline='') as f:
+            if self.file_format == 'csv':
+                yield from csv.DictReader(f)
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def build_cache(self, path):
+        building = f"{path}.{os.getpid()}.tmp"
+        connection = sqlite3.connect(building)
+        try:
+            for table, columns in LEGACY_SCHEMA.items():
+                connection.execute(
+                    f"CREATE TABLE {table} ("
+                    + ", ".join(f"{name} {kind}" for name, kind in columns)
+                    + f", PRIMARY KEY ({columns[0][0]}))"
+                )
+                if not os.path.exists(self.dump_path(table)):
+                    continue
+                insert = f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})"
+                connection.executemany(insert, (
+                    [convert_dump_value(record.get(name), kind) for name, kind in columns]
+                    for record in self.read_dump(table)
+                ))
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(building, path)
+
+    def connect(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"No dump directory at {self.directory}")
+        path = os.path.join(self.directory, self.CACHE_NAME)
+        dumps = [self.dump_path(t) for t in LEGACY_SCHEMA if os.path.exists(self.dump_path(t))]
+        if not dumps:
+            raise FileNotFoundError(f"No .{self.file_format} dumps in {self.directory}")
+        if not os.path.exists(path) or os.path.getmtime(path) < max(os.path.getmtime(d) for d in dumps):
+            self.build_cache(path)
+        return SqliteConnection(path)
+
+
+def confined_path(path, root):
+    # The real path of `path` taken relative to root; anything resolving outside it (.., absolute paths,
+    # symlinks) is refused
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError("PATH must be inside the import directory")
+    return resolved
+
+
+def source_from_config(config):
+    # SOURCE defaults to the live SQL Server; file sources take a PATH
+    kind = config.get('SOURCE') or 'odbc'
+    if kind == 'odbc':
+        if not config.get('SERVER') or not config.get('DATABASE'):
+            raise ValueError("SERVER and DATABASE must be provided")
+        return OdbcSource(config['SERVER'], config['DATABASE'])
+    if not config.get('PATH'):
+        raise ValueError("PATH must be provided for file sources")
+    if kind == 'sqlite':
+        return SqliteSource(config['PATH'])
+    if kind in DumpSource.FORMATS:
+        return DumpSource(config['PATH'], kind)
+    raise ValueError(f"Unknown SOURCE: {kind}")
@@ -1,3 +1,187 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from LogModule.models import Log
+from UserModule.models import GenPerson, SecUser
+from .importer import run_import
+from .models import ImportFingerprint, ImportJob, ImportWatermark
+from .sources import DumpSource
+
+
+class RecordedQueries(list):
+    # An execute wrapper: CaptureQueriesContext reads connection.queries, which the importer resets after every chunk
+    def __call__(self, execute, sql, params, many, context):
+        self.append(sql)
+        return execute(sql, params, many, context)
+
+
+class DumpImportTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = DumpSource(self.directory, 'jsonl')
+
+    def write_dump(self, table, records, age=0):
+        path = os.path.join(self.directory, f'{table}.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        # Older dumps, so a rewritten one is newer than the cache built from them
+        os.utime(path, (os.path.getatime(path), os.path.getmtime(path) - age))
+
+    def run_import(self, incremental, **kwargs):
+        connection = self.source.connect()
+        try:
+            return run_import(connection.cursor(), source=self.source.key, incremental=incremental, **kwargs)
+        finally:
+            connection.close()
+
+    def user(self, user_id, created):
+        day, moment = created.split()
+        return {'UserID': user_id, 'UserName': f'user{user_id}', 'UPassword': 'x', 'IsAdmin': 0, 'IsActive': 1,
+                'CreationDate': day, 'CreationTime': moment}
+
+    def person(self, person_id, modified):
+        return {'PersonID': person_id, 'FullName': f'Person {person_id}', 'Gender': 1, 'HasParrent': 0,
+                'CreationDate': '2024-01-01', 'CreationTime': '09:00:00', 'ModificationTime': modified}
+
+
+class IncrementalFileImportTests(DumpImportTestCase):
+    # Incremental runs bind the stored watermarks (dates, times, datetimes) as query parameters
+    def test_incremental_import_from_dump(self):
+        users = [self.user(1, '2024-01-01 08:00:00'), self.user(2, '2024-01-02 08:00:00'),
+                 self.user(3, '2024-01-02 09:30:00')]
+        people = [self.person(1, '2024-02-01 10:00:00'), self.person(2, '2024-02-03 10:00:00')]
+        self.write_dump('Sec_Users', users, age=60)
+        self.write_dump('Gen_Person', people, age=60)
+        self.run_import(incremental=False)
+        self.assertEqual(SecUser.objects.count(), 3)
+        self.assertTrue(ImportWatermark.objects.get(source=self.source.key, table='Sec_Users').last_created)
+        self.assertTrue(ImportWatermark.objects.get(source=self.source.key, table='Gen_Person').last_modified)
+
+        people[0]['ModificationTime'] = '2024-03-01 12:00:00'
+        people[0]['FullName'] = 'Renamed'
+        self.write_dump('Sec_Users', users + [self.user(4, '2024-01-03 07:00:00')])
+        self.write_dump('Gen_Person', people)
+        stats = self.run_import(incremental=True)
+
+        # Only rows at or past the watermarks are read: the last user (boundary), the new one, and the person
+        # modified since along with the one holding the watermark
+        self.assertEqual(stats['Sec_Users']['rows'], 2)
+        self.assertEqual(stats['Gen_Person']['rows'], 2)
+        self.assertEqual(set(SecUser.objects.values_list('id', flat=True)), {1, 2, 3, 4})
+        self.assertEqual(GenPerson.objects.get(id=1).full_name, 'Renamed')
+
+    def test_imported_creation_time_is_written_by_the_upsert(self):
+        self.write_dump('Sec_Users', [self.user(1, '2024-01-01 08:00:00')], age=60)
+        queries = RecordedQueries()
+        with connection.execute_wrapper(queries):
+            self.run_import(incremental=False)
+        self.assertEqual(SecUser.objects.get(id=1).creation_datetime, datetime(2024, 1, 1, 8, tzinfo=timezone.utc))
+        self.assertTrue([sql for sql in queries if sql.startswith('INSERT INTO "UserModule_secuser"')])
+        self.assertFalse([sql for sql in queries if sql.startswith('UPDATE "UserModule_secuser"')])
+
+    def test_skipped_and_unresolved_rows_are_retried(self):
+        # Sec_Users is imported before Gen_Person, so user 1 is first written without its person; visit 1 is
+        # skipped while its member is missing from the dump
+        user = {**self.user(1, '2024-01-01 08:00:00'), 'PersonID': 7}
+        member = {'MemberID': 6, 'PersonID': 7, 'IsBlackList': 0}
+        visits = [
+            {'TrafficID': 1, 'MemberID': 8, 'EntryDate': '2024-01-05', 'EntryTime': '10:00:00'},
+            {'TrafficID': 2, 'MemberID': 6, 'EntryDate': '2024-01-06', 'EntryTime': '10:00:00'},
+        ]
+        self.write_dump('Sec_Users', [user], age=60)
+        self.write_dump('Gen_Person', [self.person(7, '2024-01-01 10:00:00')], age=60)
+        self.write_dump('Gen_Members', [member], age=60)
+        self.write_dump('Acc_Traffic', visits, age=60)
+        self.run_import(incremental=False)
+        self.assertIsNone(SecUser.objects.get(id=1).person_id)
+        self.assertEqual(list(Log.objects.values_list('legacy_id', flat=True)), [2])
+
+        self.write_dump('Gen_Members', [member, {'MemberID': 8, 'PersonID': 7, 'IsBlackList': 0}])
+        self.run_import(incremental=True)
+        self.assertEqual(SecUser.objects.get(id=1).person_id, 7)
+        self.assertEqual(sorted(Log.objects.values_list('legacy_id', flat=True)), [1, 2])
+
+        # Nothing is held any more: only the boundary rows are read
+        stats = self.run_import(incremental=True)
+        self.assertEqual(stats['Acc_Traffic']['rows'], 1)
+        self.assertIsNone(ImportWatermark.objects.get(source=self.source.key, table='Acc_Traffic').retry_pk)
+
+
+class FingerprintTests(DumpImportTestCase):
+    # Full runs re-read every row but only write those whose fingerprint changed
+    def setUp(self):
+        super().setUp()
+        self.people = [
+            {**self.person(1, '2024-02-01 10:00:00'), 'ThumbnailImage': base64.b64encode(b'thumb-1').decode()},
+            self.person(2, '2024-02-01 10:00:00'),
+        ]
+        self.write_dump('Gen_Person', self.people, age=60)
+        self.run_import(incremental=False)
+
+    def import_people(self):
+        # Returns the Gen_Person stats and the number of statements that wrote people
+        queries = RecordedQueries()
+        with connection.execute_wrapper(queries):
+            stats = self.run_import(incremental=False)['Gen_Person']
+        return stats, sum(1 for sql in queries if sql.startswith('INSERT INTO "UserModule_genperson"'))
+
+    def test_unchanged_rows_are_not_rewritten(self):
+        stats, writes = self.import_people()
+        self.assertEqual((stats['unchanged'], stats['inserted'], stats['updated']), (2, 0, 0))
+        self.assertEqual(writes, 0)
+
+    def test_changed_blob_is_rewritten(self):
+        self.people[0]['ThumbnailImage'] = base64.b64encode(b'thumb-2').decode()
+        self.write_dump('Gen_Person', self.people)
+        stats, writes = self.import_people()
+        self.assertEqual((stats['unchanged'], stats['updated']), (1, 1))
+        self.assertEqual(writes, 1)
+        self.assertEqual(bytes(GenPerson.objects.get(id=1).thumbnail_image), b'thumb-2')
+
+    def test_api_edit_forgets_the_fingerprint(self):
+        response = self.client.patch('/api/dynamic/?action=person&id=1', {'full_name': 'Edited'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ImportFingerprint.objects.filter(table='Gen_Person', row_id=1).exists())
+
+        # The legacy row is unchanged, yet the local edit is overwritten by the next import
+        stats, writes = self.import_people()
+        self.assertEqual((stats['unchanged'], stats['updated'], writes), (1, 1, 1))
+        self.assertEqual(GenPerson.objects.get(id=1).full_name, 'Person 1')
+
+    def test_dry_run_commits_no_checkpoint(self):
+        job = ImportJob.objects.create(source=self.source.key, config={'DRY_RUN': True})
+        self.people.append(self.person(3, '2024-02-01 10:00:00'))
+        self.write_dump('Gen_Person', self.people)
+        self.run_import(incremental=False, job=job, dry_run=True)
+        progress = job.tables.get(table='Gen_Person')
+        self.assertEqual((progress.rows_read, progress.rows_inserted, progress.rows_unchanged), (3, 1, 2))
+        self.assertIsNone(progress.checkpoint)
+        self.assertFalse(GenPerson.objects.filter(id=3).exists())
+
+
+class FileSourceRequestTests(TestCase):
+    def post(self, config):
+        return self.client.post('/api/import-initial-data/', json.dumps(config), content_type='application/json')
+
+    def test_refused_without_import_root(self):
+        response = self.post({'SOURCE': 'sqlite', 'PATH': '/etc/passwd'})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_path_outside_import_root(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with override_settings(LEGACY_IMPORT_ROOT=root):
+            for path in ('../outside', '/etc', 'dumps/../../outside'):
+                response = self.post({'SOURCE': 'jsonl', 'PATH': path})
+                self.assertEqual(response.status_code, 400, path)
+        self.assertFalse(ImportJob.objects.exists())
@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import DataImportFromJsonConfigAPIView
+from .views import DataImportFromJsonConfigAPIView, ImportJobAPIView
 
 urlpatterns = [
     path('import-initial-data/', DataImportFromJsonConfigAPIView.as_view(), name='import-initial-data'),
+    path('import-jobs/', ImportJobAPIView.as_view(), name='import-jobs'),
 ]
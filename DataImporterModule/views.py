@@ -1,189 +1,136 @@
 import json
-import pyodbc
-from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from UserModule.models import (
-    GenMembershipType, GenPersonRole, GenShift,
-    SecUser, GenPerson, GenMember
-)
-
-
-def safe_combine(date_part, time_part):
-    try:
-        if isinstance(date_part, str):
-            date_part = datetime.strptime(date_part, "%Y-%m-%d").date()
-        if isinstance(time_part, str):
-            time_part = datetime.strptime(time_part, "%H:%M:%S").time()
-        return datetime.combine(date_part, time_part)
-    except Exception:
-        return None
+from .copy_loader import check_supported
+from .importer import CHUNK_SIZE
+from .jobs import abandon_stale_jobs, is_resumable, start_job
+from .models import ImportJob
+from .serializers import ImportJobSerializer
+from .sources import confined_path, source_from_config
 
 
 class DataImportFromJsonConfigAPIView(APIView):
     def post(self, request):
         try:
             data = json.loads(request.body)
-            server = data.get('SERVER')
-            database = data.get('DATABASE')
-
-            if not server or not database:
-                return JsonResponse({"error": "SERVER and DATABASE must be provided"}, status=400)
-
-            conn = pyodbc.connect(
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                f"SERVER={server};"
-                f"DATABASE={database};"
-                "Trusted_Connection=yes;"
-            )
-            cursor = conn.cursor()
-
-            # Import GenShift
-            cursor.execute("SELECT ShiftID, ShiftDesc FROM Gen_Shift")
-            for row in cursor.fetchall():
-                GenShift.objects.update_or_create(
-                    id=row.ShiftID,
-                    defaults={'shift_desc': row.ShiftDesc}
-                )
-
-            # Import GenPersonRole
-            cursor.execute("SELECT RoleID, RoleDesc FROM Gen_PersonRole")
-            for row in cursor.fetchall():
-                GenPersonRole.objects.update_or_create(
-                    id=row.RoleID,
-                    defaults={'role_desc': row.RoleDesc}
-                )
-
-            # Import GenMembershipType
-            cursor.execute("SELECT MembershipTypeID, MembershipTypeDesc FROM Gen_MembershipType")
-            for row in cursor.fetchall():
-                GenMembershipType.objects.update_or_create(
-                    id=row.MembershipTypeID,
-                    defaults={'membership_type_desc': row.MembershipTypeDesc}
-                )
-
-            # Import SecUser
-            cursor.execute("""
-                SELECT UserID, PersonID, UserName, UPassword, IsAdmin, ShiftID, 
-                       IsActive, CreationDate, CreationTime
-                FROM Sec_Users
-            """)
-            for row in cursor.fetchall():
-                creation_datetime = safe_combine(row.CreationDate, row.CreationTime) or datetime.now()
-                shift_instance = GenShift.objects.filter(id=row.ShiftID).first() if row.ShiftID else None
-                person_instance = GenPerson.objects.filter(id=row.PersonID).first() if row.PersonID else None
-
-                SecUser.objects.update_or_create(
-                    id=row.UserID,
-                    defaults={
-                        'username': row.UserName,
-                        'password': row.UPassword,
-                        'is_admin': row.IsAdmin,
-                        'shift': shift_instance,
-                        'is_active': row.IsActive,
-                        'creation_datetime': creation_datetime,
-                        'person': person_instance,
-                    }
-                )
-
-            # Import GenPerson
-            cursor.execute("""
-                SELECT PersonID, FirstName, LastName, FullName, FatherName, Gender, NationalCode, 
-                       Nidentity, PersonImage, ThumbnailImage, BirthDate, Tel, Mobile, Email, 
-                       Education, Job, HasInsurance, InsuranceNo, InsStartDate, InsEndDate, PAddress, 
-                       HasParrent, TeamName, ShiftID, UserID, CreationDate, CreationTime, Modifier, ModificationTime
-                FROM Gen_Person
-            """)
-            for row in cursor.fetchall():
-                gender = {0: 'F', 1: 'M'}.get(row.Gender, 'O')
-                creation_datetime = safe_combine(row.CreationDate, row.CreationTime) or datetime.now()
-                modification_datetime = row.ModificationTime if row.ModificationTime else None
-
-                shift_instance = GenShift.objects.filter(id=row.ShiftID).first() if row.ShiftID else None
-                user_instance = SecUser.objects.filter(id=row.UserID).first() if row.UserID else None
-
-                GenPerson.objects.update_or_create(
-                    id=row.PersonID,
-                    defaults={
-                        'first_name': row.FirstName,
-                        'last_name': row.LastName,
-                        'full_name': row.FullName,
-                        'father_name': row.FatherName,
-                        'gender': gender,
-                        'national_code': row.NationalCode,
-                        'nidentity': row.Nidentity,
-                        'person_image': row.PersonImage,
-                        'thumbnail_image': row.ThumbnailImage,
-                        'birth_date': row.BirthDate,
-                        'tel': row.Tel,
-                        'mobile': row.Mobile,
-                        'email': row.Email,
-                        'education': row.Education,
-                        'job': row.Job,
-                        'has_insurance': row.HasInsurance,
-                        'insurance_no': row.InsuranceNo,
-                        'ins_start_date': row.InsStartDate,
-                        'ins_end_date': row.InsEndDate,
-                        'address': row.PAddress,
-                        'has_parrent': row.HasParrent,
-                        'team_name': row.TeamName,
-                        'shift': shift_instance,
-                        'user': user_instance,
-                        'creation_datetime': creation_datetime,
-                        'modifier': row.Modifier,
-                        'modification_datetime': modification_datetime,
-                    }
-                )
-
-            # Import GenMember
-            cursor.execute("""
-                SELECT MemberID, CardNo, PersonID, RoleID, UserID, ShiftID, 
-                       IsBlackList, BoxRadifNo, HasFinger, MembershipDate, MembershipTime, 
-                       Modifier, Modificationtime, IsFamily, MaxDebit, Minutiae, 
-                       Minutiae2, Minutiae3, Salary, FaceTmpl1, FaceTmpl2, FaceTmpl3, 
-                       FaceTmpl4, FaceTmpl5
-                FROM Gen_Members
-            """)
-            for row in cursor.fetchall():
-                membership_datetime = safe_combine(row.MembershipDate, row.MembershipTime)
-                modification_datetime = row.Modificationtime if row.Modificationtime else None
-
-                person_instance = GenPerson.objects.filter(id=row.PersonID).first() if row.PersonID else None
-                role_instance = GenPersonRole.objects.filter(id=row.RoleID).first() if row.RoleID else None
-                user_instance = SecUser.objects.filter(id=row.UserID).first() if row.UserID else None
-                shift_instance = GenShift.objects.filter(id=row.ShiftID).first() if row.ShiftID else None
-
-                GenMember.objects.update_or_create(
-                    id=row.MemberID,
-                    defaults={
-                        'card_no': row.CardNo,
-                        'person': person_instance,
-                        'role': role_instance,
-                        'user': user_instance,
-                        'shift': shift_instance,
-                        'is_black_list': row.IsBlackList,
-                        'box_radif_no': row.BoxRadifNo,
-                        'has_finger': row.HasFinger,
-                        'membership_datetime': membership_datetime,
-                        'modifier': row.Modifier,
-                        'modification_datetime': modification_datetime,
-                        'is_family': row.IsFamily,
-                        'max_debit': row.MaxDebit,
-                        'minutiae': row.Minutiae,
-                        'minutiae2': row.Minutiae2,
-                        'minutiae3': row.Minutiae3,
-                        'salary': row.Salary,
-                        'face_template_1': row.FaceTmpl1,
-                        'face_template_2': row.FaceTmpl2,
-                        'face_template_3': row.FaceTmpl3,
-                        'face_template_4': row.FaceTmpl4,
-                        'face_template_5': row.FaceTmpl5,
-                    }
-                )
-
-            return Response({"message": "Data imported successfully"}, status=status.HTTP_200_OK)
+
+            # File sources are only read from under LEGACY_IMPORT_ROOT
+            if (data.get('SOURCE') or 'odbc') != 'odbc':
+                if not settings.LEGACY_IMPORT_ROOT:
+                    return JsonResponse(
+                        {"error": "File sources can only be imported with the import_legacy command"}, status=403,
+                    )
+                try:
+                    if data.get('PATH'):
+                        data['PATH'] = confined_path(data['PATH'], settings.LEGACY_IMPORT_ROOT)
+                except ValueError as e:
+                    return JsonResponse({"error": str(e)}, status=400)
+
+            try:
+                source = source_from_config(data)
+            except ValueError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+
+            try:
+                chunk_size = int(data.get('CHUNK_SIZE', CHUNK_SIZE))
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "CHUNK_SIZE must be an integer"}, status=400)
+            if chunk_size < 1:
+                return JsonResponse({"error": "CHUNK_SIZE must be positive"}, status=400)
+
+            try:
+                workers = int(data.get('WORKERS', 1))
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "WORKERS must be an integer"}, status=400)
+            if workers < 1:
+                return JsonResponse({"error": "WORKERS must be positive"}, status=400)
+
+            if data.get('INITIAL_LOAD'):
+                try:
+                    check_supported()
+                except ValueError as e:
+                    return JsonResponse({"error": str(e)}, status=400)
+
+            # One active job per source (a database constraint); a job that stopped beating makes way
+            abandon_stale_jobs(source.key)
+            try:
+                with transaction.atomic():
+                    job = ImportJob.objects.create(
+                        source=source.key,
+                        config={
+                            'SOURCE': data.get('SOURCE') or 'odbc',
+                            'SERVER': data.get('SERVER'),
+                            'DATABASE': data.get('DATABASE'),
+                            'PATH': data.get('PATH'),
+                            'STREAM': bool(data.get('STREAM')),
+                            'CHUNK_SIZE': chunk_size,
+                            'INCREMENTAL': bool(data.get('INCREMENTAL')),
+                            'WORKERS': workers,
+                            'DRY_RUN': bool(data.get('DRY_RUN')),
+                            'INITIAL_LOAD': bool(data.get('INITIAL_LOAD')),
+                        },
+                    )
+            except IntegrityError:
+                return JsonResponse({"error": "An import from this source is already running"}, status=409)
+            if not start_job(job):
+                return JsonResponse({"error": "An import from this source is already running"}, status=409)
+
+            return Response({"message": "Import started", "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
 
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
+
+
+class ImportJobAPIView(APIView):
+    def get(self, request):
+        job_id = request.query_params.get('id')
+        if job_id:
+            try:
+                job = ImportJob.objects.get(id=job_id)
+                serializer = ImportJobSerializer(job)
+                return Response(serializer.data)
+            except ImportJob.DoesNotExist:
+                return Response({'error': 'Import job not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        jobs = ImportJob.objects.order_by('-id')
+
+        # Pagination
+        try:
+            page = int(request.query_params.get('page', 1))
+            limit = int(request.query_params.get('limit', 10))
+            if page < 1 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = (page - 1) * limit
+        end = start + limit
+        paginated_jobs = jobs[start:end].prefetch_related('tables')
+
+        serializer = ImportJobSerializer(paginated_jobs, many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        # Resume a failed (or abandoned) job from its last committed batch
+        job_id = request.query_params.get('id')
+        if not job_id:
+            return Response({'error': 'ID query param required to resume a job.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            job = ImportJob.objects.get(id=job_id)
+        except ImportJob.DoesNotExist:
+            return Response({'error': 'Import job not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if not is_resumable(job):
+            return Response({'error': f'Import job is {job.status} and cannot be resumed.'},
+                            status=status.HTTP_409_CONFLICT)
+
+        # Claimed atomically: of concurrent requests only one starts the job
+        if not start_job(job):
+            return Response({'error': 'Import job was claimed by another request, or another import from its '
+                                      'source is running.'}, status=status.HTTP_409_CONFLICT)
+        return Response({'message': 'Import resumed', 'job_id': job.id}, status=status.HTTP_202_ACCEPTED)
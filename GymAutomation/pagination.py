@@ -0,0 +1,85 @@
+import base64
+import binascii
+import json
+
+from django.db import connection
+
+COUNT_MODES = ('estimate', 'exact', 'none')
+
+
+def encode_cursor(value, direction):
+    raw = json.dumps({'k': value, 'd': direction}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        value, direction = data['k'], data['d']
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(value, int) or direction not in ('next', 'prev'):
+        raise ValueError("Invalid cursor")
+    return value, direction
+
+
+def estimate_count(queryset):
+    # The planner's row estimate on PostgreSQL (no rows are read); other databases count exactly
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    plan = queryset.order_by().explain(format='json')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cursor_page(request, queryset, key='id'):
+    # Keyset pagination on a unique indexed key ('id' or '-id'): a page is one index range scan of limit + 1
+    # rows, however deep it is. `cursor` is empty for the first page, then a `next`/`prev` token of the response.
+    # `count` adds total_items (exact), estimated_total (estimate, the default) or nothing (none).
+    # Returns the page's objects and the pagination fields of the response; bad parameters raise ValueError.
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        raise ValueError("Invalid pagination parameters")
+    if limit < 1:
+        raise ValueError("Invalid pagination parameters")
+    count = request.query_params.get('count', 'estimate')
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of: {', '.join(COUNT_MODES)}")
+
+    token = request.query_params.get('cursor')
+    value, direction = decode_cursor(token) if token else (None, 'next')
+
+    field = key.lstrip('-')
+    descending = key.startswith('-')
+    after, before = ('lt', 'gt') if descending else ('gt', 'lt')
+    if direction == 'next':
+        page = queryset.order_by(key)
+        if value is not None:
+            page = page.filter(**{f'{field}__{after}': value})
+    else:
+        # Walk backwards from the cursor and put the rows back in order afterwards
+        page = queryset.order_by(field if descending else f'-{field}').filter(**{f'{field}__{before}': value})
+
+    items = list(page[:limit + 1])
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == 'prev':
+        items.reverse()
+
+    first = getattr(items[0], field) if items else None
+    last = getattr(items[-1], field) if items else None
+    if direction == 'next':
+        next_token = encode_cursor(last, 'next') if has_more else None
+        prev_token = encode_cursor(first, 'prev') if value is not None and items else None
+    else:
+        next_token = encode_cursor(last, 'next') if items else None
+        prev_token = encode_cursor(first, 'prev') if has_more else None
+
+    meta = {'next': next_token, 'prev': prev_token}
+    if count == 'exact':
+        meta['total_items'] = queryset.count()
+    elif count == 'estimate':
+        meta['estimated_total'] = estimate_count(queryset)
+    return items, meta
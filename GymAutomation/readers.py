@@ -0,0 +1,59 @@
+import functools
+
+from rest_framework import serializers
+
+# Fields whose to_representation returns database values unchanged
+PLAIN_FIELDS = (
+    serializers.CharField, serializers.EmailField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ReadOnlyField,
+)
+
+
+class ValuesReader:
+    # Produces what `serializer_class(queryset, many=True).data` would, from values_list tuples: no model
+    # instances are built, fields that need no conversion are copied as they are and every other one goes
+    # through its serializer field's own to_representation, so the output is the same.
+    # Nested serializers and method fields are not supported.
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class() if fields is None else serializer_class(fields=fields)
+        self.names, self.paths, self.converters = [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) \
+                    or field.source == '*':
+                raise TypeError(f"{serializer_class.__name__}.{name} cannot be read from values")
+            self.names.append(name)
+            self.paths.append('__'.join(field.source_attrs))
+            self.converters.append(None if is_plain(field) else field.to_representation)
+        self.fields = list(zip(self.names, self.converters))
+
+    def rows(self, queryset, key='id'):
+        # Named rows, so they also carry `key` (for cursor_page) when it is not serialized
+        extra = [] if key in self.paths else [key]
+        return queryset.values_list(*self.paths, *extra, named=True)
+
+    def serialize(self, rows):
+        # Values beyond the serialized fields (the key) are ignored
+        return [
+            {
+                name: value if convert is None or value is None else convert(value)
+                for (name, convert), value in zip(self.fields, row)
+            }
+            for row in rows
+        ]
+
+    def read(self, queryset):
+        return self.serialize(self.rows(queryset))
+
+
+def is_plain(field):
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.pk_field is None
+    return type(field) in PLAIN_FIELDS
+
+
+@functools.cache
+def values_reader(serializer_class, fields=None):
+    # One reader per serializer and field selection (a tuple)
+    return ValuesReader(serializer_class, fields)
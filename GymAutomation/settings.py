@@ -147,3 +147,7 @@ CORS_ALLOWED_ORIGINS = [
 
 MEDIA_URL = 'Media/'
 MEDIA_ROOT = BASE_DIR / 'Media'
+
+# Directory the import API may read SQLite copies and JSONL/CSV dumps from; a PATH given to it is taken
+# relative to this. Without it, file sources can only be imported with the import_legacy command.
+LEGACY_IMPORT_ROOT = None
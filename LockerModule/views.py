@@ -1,6 +1,8 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from GymAutomation.pagination import cursor_page
+from GymAutomation.readers import values_reader
 from django.db.models import Q
 from .models import Locker
 from .serializers import LockerSerializer
@@ -25,6 +27,16 @@ class LockerAPIView(APIView):
                 filters &= Q(**{field: value})
 
         lockers = Locker.objects.filter(filters)
+        # Lists are read as tuples, without building model instances
+        reader = values_reader(LockerSerializer)
+
+        # Keyset pagination, for deep pages
+        if 'cursor' in request.query_params:
+            try:
+                items, page = cursor_page(request, reader.rows(lockers))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'items': reader.serialize(items), **page})
 
         # Pagination
         try:
@@ -39,8 +51,7 @@ class LockerAPIView(APIView):
         end = start + limit
         paginated_lockers = lockers[start:end]
 
-        serializer = LockerSerializer(paginated_lockers, many=True)
-        return Response(serializer.data)
+        return Response(reader.read(paginated_lockers))
 
     def post(self, request):
         serializer = LockerSerializer(data=request.data)
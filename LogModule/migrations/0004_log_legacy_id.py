@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('LogModule', '0003_alter_log_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='legacy_id',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+    ]
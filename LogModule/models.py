@@ -10,6 +10,7 @@ class Log(models.Model):
     is_online = models.BooleanField(default=True)
     entry_time = models.DateTimeField(auto_now_add=True)
     exit_time = models.DateTimeField(null=True, blank=True)  # This will be set when 'is_online' changes to False
+    legacy_id = models.BigIntegerField(unique=True, null=True, blank=True)  # Acc_Traffic.TrafficID of imported visits
 
     def save(self, *args, **kwargs):
         if not self.is_online and self.exit_time is None:
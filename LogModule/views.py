@@ -1,6 +1,8 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from GymAutomation.pagination import cursor_page
+from GymAutomation.readers import values_reader
 from django.db.models import Q
 from .models import Log
 from .serializers import LogSerializer
@@ -26,6 +28,16 @@ class LogAPIView(APIView):
                 filters &= Q(**{field: value})
 
         logs = Log.objects.filter(filters)
+        # Lists are read as tuples, without building model instances
+        reader = values_reader(LogSerializer)
+
+        # Keyset pagination, for deep pages
+        if 'cursor' in request.query_params:
+            try:
+                items, page = cursor_page(request, reader.rows(logs))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'items': reader.serialize(items), **page})
 
         # Pagination
         try:
@@ -40,8 +52,7 @@ class LogAPIView(APIView):
         end = start + limit
         paginated_logs = logs[start:end]
 
-        serializer = LogSerializer(paginated_logs, many=True)
-        return Response(serializer.data)
+        return Response(reader.read(paginated_logs))
 
     def post(self, request):
         serializer = LogSerializer(data=request.data)
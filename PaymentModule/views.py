@@ -1,6 +1,8 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from GymAutomation.pagination import cursor_page
+from GymAutomation.readers import values_reader
 from django.db.models import Q
 from .models import Payment
 from .serializers import PaymentSerializer
@@ -42,6 +44,16 @@ class PaymentAPIView(APIView):
             filters &= Q(payment_date__lte=end_date)
 
         payments = Payment.objects.filter(filters)
+        # Lists are read as tuples, without building model instances
+        reader = values_reader(PaymentSerializer)
+
+        # Keyset pagination, for deep pages
+        if 'cursor' in request.query_params:
+            try:
+                items, page = cursor_page(request, reader.rows(payments))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'items': reader.serialize(items), **page})
 
         # Pagination
         try:
@@ -56,8 +68,7 @@ class PaymentAPIView(APIView):
         end = start + limit
         paginated_payments = payments[start:end]
 
-        serializer = PaymentSerializer(paginated_payments, many=True)
-        return Response(serializer.data)
+        return Response(reader.read(paginated_payments))
 
     def post(self, request):
         serializer = PaymentSerializer(data=request.data)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from .models import GenMember
+
+# Per-process cache of card_no -> access entry for turnstile check-ins. Saves and deletes of members and
+# people clear it in the process that made them once they commit; other processes pick the change up within
+# CARD_CACHE_TTL.
+# Unknown cards are cached too (as None), so repeated bad swipes stay off the database as well.
+CARD_CACHE_TTL = 30
+MAX_CACHED_CARDS = 200_000
+
+_cards = {}
+_generation = 0
+_lock = threading.Lock()
+
+
+def load_card(card_no):
+    member = (
+        GenMember.objects.filter(card_no=card_no).order_by('-id')
+        .values('id', 'person_id', 'person__full_name', 'is_black_list', 'shift_id').first()
+    )
+    if member is None:
+        return None
+    return {
+        'member_id': member['id'],
+        'person_id': member['person_id'],
+        'full_name': member['person__full_name'],
+        'is_black_list': member['is_black_list'],
+        'shift': member['shift_id'],
+    }
+
+
+def lookup_card(card_no):
+    cached = _cards.get(card_no)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    generation = _generation
+    entry = load_card(card_no)
+    with _lock:
+        # An entry loaded while the cache was being cleared may already be stale
+        if generation == _generation:
+            if len(_cards) >= MAX_CACHED_CARDS:
+                _cards.clear()
+            _cards[card_no] = (time.monotonic() + CARD_CACHE_TTL, entry)
+    return entry
+
+
+def forget_cards():
+    global _generation
+    with _lock:
+        _generation += 1
+        _cards.clear()
@@ -0,0 +1,54 @@
+from django.db.models import Exists, OuterRef
+
+from .models import GenShift, SecUser, GenPerson, GenPersonRole, GenMember, GenMembershipType, IdAllocator
+
+# Models whose ids are assigned by DynamicAPIView.post
+ALLOCATED_MODELS = (GenShift, SecUser, GenPerson, GenPersonRole, GenMember, GenMembershipType)
+
+
+def find_free_id(model, start):
+    # Lowest id >= start that is not taken: start itself, or one past the first taken id (from start up)
+    # whose successor is free. Both are primary key index lookups; no ids are loaded into Python.
+    if not model.objects.filter(pk=start).exists():
+        return start
+    successor = model.objects.filter(pk=OuterRef('pk') + 1)
+    taken = (
+        model.objects.filter(pk__gte=start).filter(~Exists(successor))
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    return taken + 1
+
+
+def allocate_id(model, start=1):
+    # Returns the lowest free id >= start. Must run in the transaction that inserts the row: the allocator
+    # row stays locked until then, so concurrent creates of the same model cannot pick the same id.
+    # Searching starts at the stored hint, so allocation does not rescan the ids that are known to be taken.
+    allocator, _ = IdAllocator.objects.select_for_update().get_or_create(model=model._meta.label)
+    new_id = find_free_id(model, max(start, allocator.next_free))
+    if start <= allocator.next_free:
+        allocator.next_free = new_id + 1
+        allocator.save(update_fields=['next_free'])
+    return new_id
+
+
+def allocate_ids(model, count):
+    # The `count` lowest free ids, for bulk creates; same locking and hint as allocate_id.
+    # Dense runs of taken ids are skipped with the gap query, the ids after a gap are checked a window at a time.
+    if count < 1:
+        return []
+    allocator, _ = IdAllocator.objects.select_for_update().get_or_create(model=model._meta.label)
+    ids, candidate = [], allocator.next_free
+    while len(ids) < count:
+        candidate = find_free_id(model, candidate)
+        end = candidate + (count - len(ids)) * 2
+        taken = set(model.objects.filter(pk__gte=candidate, pk__lt=end).values_list('pk', flat=True))
+        ids += [i for i in range(candidate, end) if i not in taken][:count - len(ids)]
+        candidate = ids[-1] + 1
+    allocator.next_free = candidate
+    allocator.save(update_fields=['next_free'])
+    return ids
+
+
+def release_id(model, pk):
+    # A deleted id below the hint becomes the next one handed out
+    IdAllocator.objects.filter(model=model._meta.label, next_free__gt=pk).update(next_free=pk)
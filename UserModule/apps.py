@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UsermoduleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'UserModule'
+
+    def ready(self):
+        from .signals import connect_signals
+        connect_signals()
@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import BinaryField
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .allocator import allocate_ids
+from .biometrics import write_biometrics
+from .signals import bulk_saved
+
+MAX_BATCH_OPERATIONS = 1000
+OPERATIONS = ('create', 'update', 'delete')
+
+
+class PreloadedObjects:
+    # Stands in for a related field's queryset, so the ids referenced by a whole batch are checked with one query
+    def __init__(self, model, values):
+        self.model = model
+        keys = set()
+        for value in values:
+            try:
+                keys.add(self.to_key(value))
+            except ValueError:
+                pass
+        self.objects = model.objects.only('pk').in_bulk(keys)
+
+    def to_key(self, value):
+        try:
+            return self.model._meta.pk.to_python(value)
+        except ValidationError:
+            raise ValueError(value)
+
+    def get(self, pk):
+        obj = self.objects.get(self.to_key(pk))
+        if obj is None:
+            raise self.model.DoesNotExist
+        return obj
+
+
+def validate_operations(model, serializer_class, operations):
+    # Checks every operation without writing anything; returns (plan, errors by operation index).
+    # Ids are never written: creates get allocated ids, updates and deletes address rows by `id`.
+    # Must run in the transaction that applies the plan: the rows addressed stay locked until it commits,
+    # so nothing written meanwhile is overwritten with what was read here.
+    errors, checked = {}, []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            errors[index] = {'op': [f"Must be one of: {', '.join(OPERATIONS)}."]}
+            continue
+        op = operation['op']
+        data = operation.get('data')
+        if op != 'delete' and not isinstance(data, dict):
+            errors[index] = {'data': ['An object of field values is required.']}
+            continue
+        key = None
+        if op != 'create':
+            try:
+                key = model._meta.pk.to_python(operation.get('id'))
+            except ValidationError:
+                pass
+            if key is None:
+                errors[index] = {'id': ['A valid id is required.']}
+                continue
+        checked.append((index, op, key, data))
+
+    key_counts = Counter(key for _, _, key, _ in checked if key is not None)
+    updated = {name for _, op, _, data in checked if op == 'update' for name in data}
+    untouched_blobs = [
+        f.name for f in model._meta.concrete_fields if isinstance(f, BinaryField) and f.name not in updated
+    ]
+    instances = model.objects.select_for_update().defer(*untouched_blobs).order_by('pk').in_bulk(list(key_counts))
+
+    writable = [name for name in serializer_class.Meta.fields if name != 'id']
+    preloaded = {}
+    for name, field in serializer_class(fields=writable).fields.items():
+        if isinstance(field, PrimaryKeyRelatedField) and not field.read_only:
+            values = [data[name] for _, op, _, data in checked if op != 'delete' and data.get(name) not in (None, '')]
+            preloaded[name] = PreloadedObjects(field.queryset.model, values)
+
+    plan = []
+    for index, op, key, data in checked:
+        if key is not None and key_counts[key] > 1:
+            errors[index] = {'id': ['Appears in more than one operation.']}
+            continue
+        if key is not None and key not in instances:
+            errors[index] = {'id': ['Not found.']}
+            continue
+        if op == 'delete':
+            plan.append((index, op, instances[key], None))
+            continue
+        serializer = serializer_class(instances.get(key), data=data, partial=op == 'update', fields=writable)
+        for name, objects in preloaded.items():
+            serializer.fields[name].queryset = objects
+        if not serializer.is_valid():
+            errors[index] = serializer.errors
+            continue
+        plan.append((index, op, instances.get(key), serializer.validated_data))
+    return plan, errors
+
+
+def apply_operations(model, plan):
+    # Must run in the transaction of validate_operations: one DELETE (with its cascade), a bulk UPDATE per
+    # distinct set of updated fields (only the fields an operation sets are written) and one bulk INSERT.
+    # Returns a result per operation, in request order.
+    results = {}
+
+    # Ids are allocated before the deletes, so a create never reuses an id deleted by the same batch
+    creates = [(index, data) for index, op, _, data in plan if op == 'create']
+    ids = allocate_ids(model, len(creates))
+
+    deletes = [(index, instance) for index, op, instance, _ in plan if op == 'delete']
+    if deletes:
+        model.objects.filter(pk__in=[instance.pk for _, instance in deletes]).delete()
+        for index, instance in deletes:
+            results[index] = {'index': index, 'op': 'delete', 'id': instance.pk, 'status': 'deleted'}
+
+    # Member templates go to their side table, after the members exist
+    biometrics = {}
+
+    updates = [(index, instance, data) for index, op, instance, data in plan if op == 'update']
+    if updates:
+        groups = defaultdict(list)
+        for index, instance, data in updates:
+            if 'biometrics' in data:
+                biometrics[instance.pk] = data.pop('biometrics')
+            for name, value in data.items():
+                setattr(instance, name, value)
+            if data:
+                groups[tuple(sorted(data))].append(instance)
+            results[index] = {'index': index, 'op': 'update', 'id': instance.pk, 'status': 'updated'}
+        for fields, instances in groups.items():
+            model.objects.bulk_update(instances, fields)
+
+    if creates:
+        for new_id, (_, data) in zip(ids, creates):
+            if 'biometrics' in data:
+                biometrics[new_id] = data.pop('biometrics')
+        model.objects.bulk_create([model(id=new_id, **data) for new_id, (_, data) in zip(ids, creates)])
+        for new_id, (index, _) in zip(ids, creates):
+            results[index] = {'index': index, 'op': 'create', 'id': new_id, 'status': 'created'}
+
+    write_biometrics(biometrics)
+
+    saved = [result['id'] for result in results.values() if result['op'] != 'delete']
+    if saved:
+        bulk_saved.send(sender=model, ids=saved)
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,175 @@
+import heapq
+import struct
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import signals  # module import: UserModule.signals imports this module
+from .models import BiometricsRemoval, IdAllocator, MemberBiometrics
+
+BIOMETRIC_FIELDS = (
+    'minutiae', 'minutiae2', 'minutiae3',
+    'face_template_1', 'face_template_2', 'face_template_3', 'face_template_4', 'face_template_5',
+)
+# The version counter is an IdAllocator row. Drawing from it locks the row until the writing transaction
+# commits, so versions become visible in order and a device that saw version N has every change up to N.
+VERSION_COUNTER = MemberBiometrics._meta.label
+
+# Template bundles for devices (TemplateBundleAPIView). Big-endian throughout:
+#   header: BUNDLE_MAGIC, flags (BUNDLE_FULL: replaces every template the device has), the bundle's version
+#   records, in version order, each prefixed by its length in bytes (uint32); a zero length ends the bundle:
+#     member id (uint64), version (uint64), flags (RECORD_REMOVED: drop the member), template count (uint8),
+#     then per template its index in BIOMETRIC_FIELDS (uint8), its length (uint32) and its bytes
+# A record replaces all templates of its member. A device passes the bundle's version as `since` next time.
+BUNDLE_MAGIC = b'GTB1'
+BUNDLE_FULL = 1
+RECORD_REMOVED = 1
+BUNDLE_HEADER = struct.Struct('>4sBQ')
+RECORD_HEADER = struct.Struct('>IQQBB')
+TEMPLATE_HEADER = struct.Struct('>BI')
+BUNDLE_END = struct.pack('>I', 0)
+BUNDLE_CHUNK_SIZE = 64 * 1024
+BUNDLE_BATCH_SIZE = 500
+
+
+def next_versions(count):
+    with transaction.atomic():
+        counter, _ = IdAllocator.objects.select_for_update().get_or_create(model=VERSION_COUNTER)
+        first = counter.next_free
+        counter.next_free = first + count
+        counter.save(update_fields=['next_free'])
+    return range(first, first + count)
+
+
+def current_version():
+    # Every version up to this one is committed
+    next_free = IdAllocator.objects.filter(model=VERSION_COUNTER).values_list('next_free', flat=True).first()
+    return next_free - 1 if next_free else 0
+
+
+def stamp_versions(rows):
+    for row, version in zip(rows, next_versions(len(rows))):
+        row.version = version
+
+
+def stamp_written(rows):
+    # Imports: rows already written (with a placeholder version) get theirs in one UPDATE, as the last statement
+    # of their transaction, so the counter is not held while their templates are written
+    if rows:
+        stamp_versions(rows)
+        MemberBiometrics.objects.bulk_update(rows, ['version'], batch_size=len(rows))
+
+
+def stamp_merged(cursor, stage):
+    # Initial loads: the same for the rows merged from a staging table
+    cursor.execute(f"SELECT count(*) FROM {stage}")
+    versions = next_versions(cursor.fetchone()[0])
+    cursor.execute(f"""
+        UPDATE {connection.ops.quote_name(MemberBiometrics._meta.db_table)} AS target
+        SET version = %s + numbered.position - 1
+        FROM (SELECT member_id, row_number() OVER (ORDER BY member_id) AS position FROM {stage}) AS numbered
+        WHERE target.member_id = numbered.member_id
+    """, [versions.start])
+
+
+def write_biometrics(values_by_member):
+    # {member id: {field: value}}: creates or updates each member's row, leaving fields not given alone,
+    # with one upsert per distinct set of fields
+    if not values_by_member:
+        return
+    with transaction.atomic():
+        versions = iter(next_versions(len(values_by_member)))
+        groups = defaultdict(list)
+        for member_id, values in values_by_member.items():
+            groups[tuple(sorted(values))].append(
+                MemberBiometrics(member_id=member_id, version=next(versions), **values)
+            )
+        for fields, rows in groups.items():
+            MemberBiometrics.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['member'],
+                update_fields=[*fields, 'version', 'updated_at'],
+            )
+        sync_blocked(list(values_by_member))
+    signals.bulk_saved.send(sender=MemberBiometrics, ids=list(values_by_member))
+
+
+def sync_blocked(member_ids=None):
+    # Gives a new version to the templates of members blacklisted or cleared since their last version
+    rows = MemberBiometrics.objects.exclude(blocked=F('member__is_black_list'))
+    if member_ids is not None:
+        rows = rows.filter(member_id__in=member_ids)
+    with transaction.atomic():
+        changed = [
+            MemberBiometrics(member_id=member_id, blocked=blocked)
+            for member_id, blocked in rows.select_for_update(of=('self',)).values_list(
+                'member_id', 'member__is_black_list',
+            )
+        ]
+        if changed:
+            stamp_versions(changed)
+            MemberBiometrics.objects.bulk_update(changed, ['blocked', 'version'])
+
+
+def record_removals(member_ids):
+    with transaction.atomic():
+        BiometricsRemoval.objects.bulk_create(
+            [
+                BiometricsRemoval(member_id=member_id, version=version)
+                for member_id, version in zip(member_ids, next_versions(len(member_ids)))
+            ],
+            update_conflicts=True, unique_fields=['member_id'], update_fields=['version'],
+        )
+
+
+def encode_record(member_id, version, templates):
+    flags = 0 if templates else RECORD_REMOVED
+    body = b''.join(TEMPLATE_HEADER.pack(index, len(data)) + data for index, data in templates)
+    return RECORD_HEADER.pack(RECORD_HEADER.size - 4 + len(body), member_id, version, flags, len(templates)) + body
+
+
+def template_records(since, through):
+    rows = (
+        MemberBiometrics.objects.filter(version__lte=through).order_by('version')
+        .values_list('member_id', 'version', 'blocked', *BIOMETRIC_FIELDS)
+    )
+    rows = rows.filter(blocked=False) if since is None else rows.filter(version__gt=since)
+    for member_id, version, blocked, *values in rows.iterator(BUNDLE_BATCH_SIZE):
+        templates = [] if blocked else [(index, bytes(value)) for index, value in enumerate(values) if value]
+        if templates or since is not None:
+            yield version, encode_record(member_id, version, templates)
+
+
+def removal_records(since, through):
+    removals = (
+        BiometricsRemoval.objects.filter(version__gt=since, version__lte=through).order_by('version')
+        .values_list('member_id', 'version')
+    )
+    for member_id, version in removals.iterator(BUNDLE_BATCH_SIZE):
+        yield version, encode_record(member_id, version, [])
+
+
+def bundle_chunks(header, records):
+    buffer, size = [header], len(header)
+    for _, record in records:
+        buffer.append(record)
+        size += len(record)
+        if size >= BUNDLE_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    buffer.append(BUNDLE_END)
+    yield b''.join(buffer)
+
+
+def template_bundle(since=None):
+    # Returns the bundle's version and its bytes, in chunks. Without `since` (or with one this database never
+    # issued) it holds the templates of every member that is not blacklisted; otherwise every change after
+    # `since`, removals included. Only versions committed when it starts are read, so later writes are left
+    # for the next bundle.
+    through = current_version()
+    if since is None or since > through:
+        header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_FULL, through)
+        return through, bundle_chunks(header, template_records(None, through))
+    header = BUNDLE_HEADER.pack(BUNDLE_MAGIC, 0, through)
+    records = heapq.merge(template_records(since, through), removal_records(since, through), key=lambda r: r[0])
+    return through, bundle_chunks(header, records)
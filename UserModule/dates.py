@@ -0,0 +1,89 @@
+import re
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Tolerant parsing of the dates the legacy system stored as text: ISO dates and datetimes, Jalali (Solar Hijri)
+# dates such as 1370/01/01, '/', '-' or '.' separators, day-first dates, and Persian or Arabic-Indic digits.
+# ISO datetimes with a UTC offset are handled by Django's parse_datetime.
+# Years before JALALI_BEFORE are taken as Jalali. Anything else parses to None.
+JALALI_BEFORE = 1700
+LEGACY_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '0123456789' * 2)
+LEGACY_PATTERN = re.compile(
+    r'(?:(?P<year>\d{4})[/.-](?P<month>\d{1,2})[/.-](?P<day>\d{1,2})'
+    r'|(?P<day_first>\d{1,2})[/.-](?P<month_mid>\d{1,2})[/.-](?P<year_last>\d{4})'
+    r'|(?P<compact>\d{8}))'
+    r'(?:[ T]+(?P<hour>\d{1,2}):(?P<minute>\d{1,2})(?::(?P<second>\d{1,2})(?:\.(?P<fraction>\d{1,6})\d*)?)?)?'
+    r'\s*'
+)
+# Offset from the day count of jalali_to_gregorian to the proleptic Gregorian ordinal of date.fromordinal
+JALALI_EPOCH = -356033
+
+
+def jalali_day_number(year, month, day):
+    # Arithmetic (33-year cycle) Solar Hijri calendar, exact for years 1178-1633
+    cycle_year = year + 1595
+    days = 365 * cycle_year + (cycle_year // 33) * 8 + ((cycle_year % 33) + 3) // 4 + day
+    return days + ((month - 1) * 31 if month < 7 else (month - 7) * 30 + 186)
+
+
+def jalali_to_gregorian(year, month, day):
+    # Esfand 30 only exists in leap years, which is when it falls before the next Farvardin 1
+    if not 1 <= month <= 12 or not 1 <= day <= (31 if month <= 6 else 30):
+        raise ValueError(f"Invalid Jalali date {year}/{month}/{day}")
+    days = jalali_day_number(year, month, day)
+    if month == 12 and day == 30 and days == jalali_day_number(year + 1, 1, 1):
+        raise ValueError(f"Invalid Jalali date {year}/{month}/{day}: {year} is not a leap year")
+    return date.fromordinal(days + JALALI_EPOCH)
+
+
+def parse_legacy(value):
+    # Returns a date, a datetime (when a time is present) or None
+    if isinstance(value, (date, datetime)):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = value.translate(LEGACY_DIGITS).strip()
+    match = LEGACY_PATTERN.fullmatch(text)
+    if match is None:
+        try:
+            return parse_datetime(text)
+        except ValueError:
+            return None
+
+    if match['compact']:
+        year, month, day = int(match['compact'][:4]), int(match['compact'][4:6]), int(match['compact'][6:])
+    elif match['year']:
+        year, month, day = int(match['year']), int(match['month']), int(match['day'])
+    else:
+        year, month, day = int(match['year_last']), int(match['month_mid']), int(match['day_first'])
+    try:
+        parsed = jalali_to_gregorian(year, month, day) if year < JALALI_BEFORE else date(year, month, day)
+        if match['hour'] is None:
+            return parsed
+        clock = time(
+            int(match['hour']), int(match['minute']), int(match['second'] or 0),
+            int((match['fraction'] or '0').ljust(6, '0')),
+        )
+    except ValueError:
+        return None
+    return datetime.combine(parsed, clock)
+
+
+def parse_legacy_date(value):
+    parsed = parse_legacy(value)
+    return parsed.date() if isinstance(parsed, datetime) else parsed
+
+
+def parse_legacy_datetime(value):
+    # Dates become midnight; naive values are taken in the current time zone
+    parsed = parse_legacy(value)
+    if parsed is None:
+        return None
+    if not isinstance(parsed, datetime):
+        parsed = datetime.combine(parsed, time.min)
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .dates import parse_legacy, parse_legacy_date, parse_legacy_datetime
+from .models import GenMember, GenMembershipType, GenPerson, GenPersonRole, GenShift, SecUser
+
+# Query-string filters DynamicAPIView.get accepts, per model: field -> lookups, the first being the default.
+# `field=v` uses the default lookup; `field__prefix=v`, `field__in=a,b` and `field__range=a,b` (either bound
+# may be left empty) pick another. Every declared filter is served by an index (primary keys, foreign keys,
+# db_index columns, whose PostgreSQL `_like` index covers prefixes, the full_name trigram index of migration
+# 0024, and partial indexes on the rare value of is_active and is_black_list, whose common value matches most
+# rows and is best scanned); the lookup tables are small enough to scan. Values are parsed as the model field's type;
+# dates also in the legacy formats of UserModule.dates. A date-only upper bound on a datetime includes that day.
+FILTERS = {
+    GenShift: {'shift_desc': ('exact',)},
+    GenPersonRole: {'role_desc': ('exact',)},
+    GenMembershipType: {'membership_type_desc': ('exact',)},
+    SecUser: {
+        'username': ('exact', 'prefix'),
+        'person': ('exact', 'in'),
+        'shift': ('exact', 'in'),
+        'is_active': ('exact',),
+        'creation_datetime': ('range',),
+    },
+    GenPerson: {
+        'full_name': ('contains',),
+        'national_code': ('exact', 'prefix', 'in'),
+        'mobile': ('exact', 'prefix', 'in'),
+        'shift': ('exact', 'in'),
+        'user': ('exact', 'in'),
+        'birth_date': ('exact', 'range'),
+        'ins_start_date': ('exact', 'range'),
+        'ins_end_date': ('exact', 'range'),
+        'creation_datetime': ('range',),
+        'modification_datetime': ('range',),
+    },
+    GenMember: {
+        'card_no': ('exact', 'prefix', 'in'),
+        'person': ('exact', 'in'),
+        'role': ('exact', 'in'),
+        'user': ('exact', 'in'),
+        'shift': ('exact', 'in'),
+        'is_black_list': ('exact',),
+        'membership_datetime': ('range',),
+        'creation_datetime': ('range',),
+        'modification_datetime': ('range',),
+    },
+}
+
+LOOKUPS = {'exact': 'exact', 'prefix': 'startswith', 'contains': 'icontains', 'in': 'in', 'range': 'range'}
+MAX_IN_VALUES = 1000
+TRUE_VALUES = ('true', '1', 't', 'yes')
+FALSE_VALUES = ('false', '0', 'f', 'no')
+
+
+def parse_value(field, name, value):
+    if field.get_internal_type() == 'BooleanField':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ValueError(f"{name} must be true or false")
+    if field.get_internal_type() in ('DateField', 'DateTimeField'):
+        parse = parse_legacy_date if field.get_internal_type() == 'DateField' else parse_legacy_datetime
+        parsed = parse(value)
+        if parsed is None:
+            raise ValueError(f"Invalid date for {name}: {value}")
+        return parsed
+    target = field.target_field if field.is_relation else field
+    try:
+        parsed = target.to_python(value)
+    except ValidationError:
+        raise ValueError(f"Invalid value for {name}: {value}")
+    if parsed is None:
+        raise ValueError(f"Invalid value for {name}: {value}")
+    return parsed
+
+
+def parse_upper_bound(field, name, value):
+    # Returns (lookup, value); a date-only bound on a datetime covers that whole day
+    parsed = parse_legacy(value)
+    if field.get_internal_type() == 'DateTimeField' and parsed is not None and not isinstance(parsed, datetime):
+        return 'lt', parse_legacy_datetime(parsed + timedelta(days=1))
+    return 'lte', parse_value(field, name, value)
+
+
+def compile_filters(model, params):
+    # `params` is [(key, value)] from the query string; returns a Q, or raises ValueError for
+    # unknown fields, lookups that are not allowed and values of the wrong type
+    spec = FILTERS.get(model, {})
+    filters = Q()
+    for key, value in params:
+        name, _, lookup = key.partition('__')
+        if name not in spec:
+            raise ValueError(f"Unknown filter: {name}")
+        lookup = lookup or spec[name][0]
+        if lookup not in spec[name]:
+            raise ValueError(f"{name} does not support {lookup}; allowed: {', '.join(spec[name])}")
+        field = model._meta.get_field(name)
+
+        if lookup == 'in':
+            values = [v for v in value.split(',') if v != '']
+            if not values or len(values) > MAX_IN_VALUES:
+                raise ValueError(f"{name}__in takes 1 to {MAX_IN_VALUES} comma-separated values")
+            filters &= Q(**{f'{name}__in': [parse_value(field, name, v) for v in values]})
+        elif lookup == 'range':
+            bounds = value.split(',')
+            if len(bounds) != 2 or bounds == ['', '']:
+                raise ValueError(f"{name}__range takes two comma-separated bounds")
+            low, high = bounds
+            if low:
+                filters &= Q(**{f'{name}__gte': parse_value(field, name, low)})
+            if high:
+                upper, bound = parse_upper_bound(field, name, high)
+                filters &= Q(**{f'{name}__{upper}': bound})
+        else:
+            filters &= Q(**{f'{name}__{LOOKUPS[lookup]}': parse_value(field, name, value)})
+    return filters
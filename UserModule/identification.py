@@ -0,0 +1,155 @@
+import threading
+
+import numpy as np
+
+from .biometrics import current_version
+from .models import BiometricsRemoval, MemberBiometrics
+
+# 1:N face identification against every member's face templates, held per process in one contiguous matrix.
+# Templates are little-endian float32 vectors, all of the length of the first one loaded (others are ignored).
+# Rows are normalized, so a probe's scores against all of them (cosine similarities) are one matrix product.
+# Each identification first applies the template versions committed since the last one (UserModule.biometrics),
+# so only the members that changed are reloaded.
+FACE_FIELDS = ('face_template_1', 'face_template_2', 'face_template_3', 'face_template_4', 'face_template_5')
+TEMPLATE_DTYPE = np.dtype('<f4')
+MAX_MATCHES = 100
+LOAD_BATCH_SIZE = 2000
+INITIAL_CAPACITY = 1024
+
+
+class FaceIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Rows [:size] of matrix are in use; members holds the member id of each row, rows the reverse
+        self.matrix = None
+        self.members = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.rows = {}
+        self.version = 0
+
+    @property
+    def dimension(self):
+        return None if self.matrix is None else self.matrix.shape[1]
+
+    def refresh(self):
+        through = current_version()
+        if through == self.version:
+            return
+        with self.lock:
+            if through < self.version:
+                # The counter went back (e.g. a restored database): start over
+                self.reset()
+            if through == self.version:
+                return
+            for member_id in BiometricsRemoval.objects.filter(
+                version__gt=self.version, version__lte=through,
+            ).values_list('member_id', flat=True).iterator(LOAD_BATCH_SIZE):
+                self.remove(member_id)
+
+            changed = (
+                MemberBiometrics.objects.filter(version__gt=self.version, version__lte=through)
+                .values_list('member_id', *FACE_FIELDS).iterator(LOAD_BATCH_SIZE)
+            )
+            batch = []
+            for row in changed:
+                batch.append(row)
+                if len(batch) == LOAD_BATCH_SIZE:
+                    self.replace(batch)
+                    batch = []
+            self.replace(batch)
+            self.version = through
+
+    def replace(self, batch):
+        # batch: (member id, *templates) rows; each member's rows are replaced by its current templates
+        member_ids, templates = [], []
+        for member_id, *values in batch:
+            self.remove(member_id)
+            for value in values:
+                if value:
+                    member_ids.append(member_id)
+                    templates.append(bytes(value))
+        if not templates:
+            return
+        if self.matrix is None:
+            sizes = [len(data) for data in templates if len(data) % TEMPLATE_DTYPE.itemsize == 0]
+            if not sizes:
+                return
+            self.grow(INITIAL_CAPACITY, sizes[0] // TEMPLATE_DTYPE.itemsize)
+
+        size = self.dimension * TEMPLATE_DTYPE.itemsize
+        kept = [i for i, data in enumerate(templates) if len(data) == size]
+        if not kept:
+            return
+        vectors = np.frombuffer(b''.join(templates[i] for i in kept), dtype=TEMPLATE_DTYPE).reshape(len(kept), -1)
+        norms = np.linalg.norm(vectors, axis=1)
+        usable = np.isfinite(norms) & (norms > 0)
+        vectors = vectors[usable] / norms[usable, None]
+        ids = np.array(member_ids, dtype=np.int64)[kept][usable]
+
+        if self.size + len(ids) > len(self.members):
+            self.grow(max(2 * len(self.members), self.size + len(ids)), self.dimension)
+        start = self.size
+        self.matrix[start:start + len(ids)] = vectors
+        self.members[start:start + len(ids)] = ids
+        for row, member_id in enumerate(ids.tolist(), start):
+            self.rows.setdefault(member_id, []).append(row)
+        self.size += len(ids)
+
+    def grow(self, capacity, dimension):
+        matrix = np.empty((capacity, dimension), dtype=np.float32)
+        members = np.empty(capacity, dtype=np.int64)
+        if self.matrix is not None:
+            matrix[:self.size] = self.matrix[:self.size]
+            members[:self.size] = self.members[:self.size]
+        self.matrix, self.members = matrix, members
+
+    def remove(self, member_id):
+        # The last row moves into each freed one, highest first, so rows [:size] stay contiguous
+        for row in sorted(self.rows.pop(member_id, ()), reverse=True):
+            last = self.size - 1
+            if row != last:
+                moved = int(self.members[last])
+                self.matrix[row] = self.matrix[last]
+                self.members[row] = moved
+                moved_rows = self.rows[moved]
+                moved_rows[moved_rows.index(last)] = row
+            self.size -= 1
+
+    def probe_vector(self, probe):
+        if self.dimension is None or len(probe) != self.dimension * TEMPLATE_DTYPE.itemsize:
+            raise ValueError(f"Probe must be {self.dimension or 0} float32 values.")
+        vector = np.frombuffer(probe, dtype=TEMPLATE_DTYPE)
+        norm = np.linalg.norm(vector)
+        if not np.isfinite(norm) or norm == 0:
+            raise ValueError("Probe must be a non-zero vector.")
+        return vector / norm
+
+    def identify(self, probe, limit=5):
+        # The `limit` best matching members as (member id, score), best first. A member counts with its best
+        # template, so the best limit * len(FACE_FIELDS) rows always hold the best `limit` members.
+        self.refresh()
+        with self.lock:
+            if self.size == 0:
+                return []
+            scores = self.matrix[:self.size] @ self.probe_vector(probe)
+            count = min(limit * len(FACE_FIELDS), self.size)
+            top = np.argpartition(scores, self.size - count)[self.size - count:]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            matches, seen = [], set()
+            for member_id, score in zip(self.members[top].tolist(), scores[top].tolist()):
+                if member_id not in seen:
+                    seen.add(member_id)
+                    matches.append((member_id, score))
+                    if len(matches) == limit:
+                        break
+        return matches
+
+
+face_index = FaceIndex()
+
+
+def identify_face(probe, limit=5):
+    return face_index.identify(probe, limit)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0020_genmember_couch_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdAllocator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, unique=True)),
+                ('next_free', models.BigIntegerField(default=1)),
+            ],
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Same mapping as UserModule.search.NORMALIZE_FROM / NORMALIZE_TO
+NORMALIZE_FROM = (
+    'يىكةۀأإآ'
+    '٠١٢٣٤٥٦٧٨٩'
+    '۰۱۲۳۴۵۶۷۸۹'
+    '\u200c'
+    '\u0640\u064b\u064c\u064d\u064e\u064f\u0650\u0651\u0652'
+)
+NORMALIZE_TO = (
+    'ییکههااا'
+    '0123456789'
+    '0123456789'
+    ' '
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    # Trigram indexes are PostgreSQL only; elsewhere the search falls back to unindexed icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm", None)
+    schema_editor.execute(f"""
+        CREATE OR REPLACE FUNCTION usermodule_normalize_search(value text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT lower(translate(coalesce(value, ''), '{NORMALIZE_FROM}', '{NORMALIZE_TO}')) $$
+    """, None)
+    schema_editor.execute("""
+        CREATE OR REPLACE FUNCTION usermodule_person_search_text(full_name text, mobile text, national_code text)
+        RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$
+            SELECT usermodule_normalize_search(
+                coalesce(full_name, '') || ' ' || coalesce(mobile, '') || ' ' || coalesce(national_code, '')
+            )
+        $$
+    """, None)
+    schema_editor.execute("""
+        CREATE INDEX IF NOT EXISTS usermodule_genperson_search_trgm ON "UserModule_genperson"
+        USING gin (usermodule_person_search_text(full_name, mobile, national_code) gin_trgm_ops)
+    """, None)
+    schema_editor.execute("""
+        CREATE INDEX IF NOT EXISTS usermodule_genmember_card_no_trgm ON "UserModule_genmember"
+        USING gin (usermodule_normalize_search(card_no) gin_trgm_ops)
+    """, None)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS usermodule_genmember_card_no_trgm", None)
+    schema_editor.execute("DROP INDEX IF EXISTS usermodule_genperson_search_trgm", None)
+    schema_editor.execute("DROP FUNCTION IF EXISTS usermodule_person_search_text(text, text, text)", None)
+    schema_editor.execute("DROP FUNCTION IF EXISTS usermodule_normalize_search(text)", None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0021_idallocator'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0022_person_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='genmember',
+            name='card_no',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+    ]
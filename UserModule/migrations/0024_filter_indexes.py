@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+def create_full_name_index(apps, schema_editor):
+    # Serves full_name filters, which PostgreSQL runs as UPPER(full_name::text) LIKE UPPER('%...%');
+    # pg_trgm comes from migration 0022
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        CREATE INDEX IF NOT EXISTS usermodule_genperson_full_name_trgm ON "UserModule_genperson"
+        USING gin (UPPER(full_name::text) gin_trgm_ops)
+    """, None)
+
+
+def drop_full_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS usermodule_genperson_full_name_trgm", None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0023_genmember_card_no_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='genmember',
+            name='creation_datetime',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='genperson',
+            name='creation_datetime',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='genperson',
+            name='mobile',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='genperson',
+            name='national_code',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='secuser',
+            name='creation_datetime',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='secuser',
+            name='username',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(create_full_name_index, drop_full_name_index),
+    ]
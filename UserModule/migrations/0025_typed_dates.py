@@ -0,0 +1,176 @@
+import re
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Frozen copy of UserModule.dates as of this migration, so later changes to the parser cannot change what it does
+JALALI_BEFORE = 1700
+LEGACY_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '0123456789' * 2)
+LEGACY_PATTERN = re.compile(
+    r'(?:(?P<year>\d{4})[/.-](?P<month>\d{1,2})[/.-](?P<day>\d{1,2})'
+    r'|(?P<day_first>\d{1,2})[/.-](?P<month_mid>\d{1,2})[/.-](?P<year_last>\d{4})'
+    r'|(?P<compact>\d{8}))'
+    r'(?:[ T]+(?P<hour>\d{1,2}):(?P<minute>\d{1,2})(?::(?P<second>\d{1,2})(?:\.(?P<fraction>\d{1,6})\d*)?)?)?'
+    r'\s*'
+)
+JALALI_EPOCH = -356033
+
+
+def jalali_day_number(year, month, day):
+    cycle_year = year + 1595
+    days = 365 * cycle_year + (cycle_year // 33) * 8 + ((cycle_year % 33) + 3) // 4 + day
+    return days + ((month - 1) * 31 if month < 7 else (month - 7) * 30 + 186)
+
+
+def jalali_to_gregorian(year, month, day):
+    if not 1 <= month <= 12 or not 1 <= day <= (31 if month <= 6 else 30):
+        raise ValueError(f"Invalid Jalali date {year}/{month}/{day}")
+    days = jalali_day_number(year, month, day)
+    if month == 12 and day == 30 and days == jalali_day_number(year + 1, 1, 1):
+        raise ValueError(f"Invalid Jalali date {year}/{month}/{day}: {year} is not a leap year")
+    return date.fromordinal(days + JALALI_EPOCH)
+
+
+def parse_legacy(value):
+    if not isinstance(value, str):
+        return None
+    text = value.translate(LEGACY_DIGITS).strip()
+    match = LEGACY_PATTERN.fullmatch(text)
+    if match is None:
+        try:
+            return parse_datetime(text)
+        except ValueError:
+            return None
+
+    if match['compact']:
+        year, month, day = int(match['compact'][:4]), int(match['compact'][4:6]), int(match['compact'][6:])
+    elif match['year']:
+        year, month, day = int(match['year']), int(match['month']), int(match['day'])
+    else:
+        year, month, day = int(match['year_last']), int(match['month_mid']), int(match['day_first'])
+    try:
+        parsed = jalali_to_gregorian(year, month, day) if year < JALALI_BEFORE else date(year, month, day)
+        if match['hour'] is None:
+            return parsed
+        clock = time(
+            int(match['hour']), int(match['minute']), int(match['second'] or 0),
+            int((match['fraction'] or '0').ljust(6, '0')),
+        )
+    except ValueError:
+        return None
+    return datetime.combine(parsed, clock)
+
+
+def parse_legacy_date(value):
+    parsed = parse_legacy(value)
+    return parsed.date() if isinstance(parsed, datetime) else parsed
+
+
+def parse_legacy_datetime(value):
+    parsed = parse_legacy(value)
+    if parsed is None:
+        return None
+    if not isinstance(parsed, datetime):
+        parsed = datetime.combine(parsed, time.min)
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+# Text columns converted to typed ones: model -> {field: is datetime}
+DATE_FIELDS = {
+    'genperson': {'birth_date': False, 'ins_start_date': False, 'ins_end_date': False, 'modification_datetime': True},
+    'genmember': {'membership_datetime': True, 'modification_datetime': True},
+}
+CONVERT_BATCH_SIZE = 2000
+
+
+def copy_dates(apps, to_typed):
+    # Streams the rows in primary key order and writes each batch back with one bulk_update. Text the parser
+    # cannot read is kept in UnparsedLegacyDate, and put back from there on the way down
+    unparsed_model = apps.get_model('UserModule', 'UnparsedLegacyDate')
+    for model_name, fields in DATE_FIELDS.items():
+        model = apps.get_model('UserModule', model_name)
+        sources = [name if to_typed else f'{name}_typed' for name in fields]
+        targets = [f'{name}_typed' if to_typed else name for name in fields]
+        kept = {} if to_typed else {
+            (row_id, field): value for row_id, field, value in
+            unparsed_model.objects.filter(model=model_name).values_list('row_id', 'field', 'value')
+        }
+        batch, unparsed = [], []
+        for pk, *values in model.objects.order_by('pk').values_list('pk', *sources).iterator(CONVERT_BATCH_SIZE):
+            obj = model(pk=pk)
+            for (name, is_datetime), target, value in zip(fields.items(), targets, values):
+                if to_typed:
+                    original = value
+                    value = parse_legacy_datetime(value) if is_datetime else parse_legacy_date(value)
+                    if value is None and isinstance(original, str) and original.strip():
+                        unparsed.append(unparsed_model(model=model_name, row_id=pk, field=name, value=original))
+                elif value is not None:
+                    value = timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if is_datetime else value.isoformat()
+                else:
+                    value = kept.get((pk, name))
+                setattr(obj, target, value)
+            batch.append(obj)
+            if len(batch) == CONVERT_BATCH_SIZE:
+                model.objects.bulk_update(batch, targets)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, targets)
+        unparsed_model.objects.bulk_create(unparsed, batch_size=CONVERT_BATCH_SIZE)
+
+
+def convert_dates(apps, schema_editor):
+    copy_dates(apps, to_typed=True)
+
+
+def restore_dates(apps, schema_editor):
+    copy_dates(apps, to_typed=False)
+
+
+def typed_field(is_datetime, **kwargs):
+    field = models.DateTimeField if is_datetime else models.DateField
+    return field(null=True, blank=True, **kwargs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0024_filter_indexes'),
+    ]
+
+    # Typed columns are added next to the text ones, filled, then take their place; the indexes are
+    # built last, once the data is in. Unreadable originals survive the drop in UnparsedLegacyDate
+    operations = [
+        migrations.AddField(model_name=model_name, name=f'{name}_typed', field=typed_field(is_datetime))
+        for model_name, fields in DATE_FIELDS.items() for name, is_datetime in fields.items()
+    ] + [
+        migrations.CreateModel(
+            name='UnparsedLegacyDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('row_id', models.BigIntegerField()),
+                ('field', models.CharField(max_length=100)),
+                ('value', models.TextField()),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('model', 'row_id', 'field'), name='unique_unparsed_legacy_date'),
+                ],
+            },
+        ),
+        migrations.RunPython(convert_dates, restore_dates),
+    ] + [
+        migrations.RemoveField(model_name=model_name, name=name)
+        for model_name, fields in DATE_FIELDS.items() for name in fields
+    ] + [
+        migrations.RenameField(model_name=model_name, old_name=f'{name}_typed', new_name=name)
+        for model_name, fields in DATE_FIELDS.items() for name in fields
+    ] + [
+        migrations.AlterField(model_name=model_name, name=name, field=typed_field(is_datetime, db_index=True))
+        for model_name, fields in DATE_FIELDS.items() for name, is_datetime in fields.items()
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0025_typed_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genperson',
+            name='photo_digest',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='genperson',
+            name='photo_type',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='genperson',
+            name='photo_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PersonThumbnail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveSmallIntegerField()),
+                ('image', models.BinaryField()),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='UserModule.genperson')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('person', 'size'), name='unique_person_thumbnail_size')],
+            },
+        ),
+    ]
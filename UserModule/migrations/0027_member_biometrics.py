@@ -0,0 +1,107 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+# Same as UserModule.biometrics.BIOMETRIC_FIELDS and VERSION_COUNTER
+BIOMETRIC_FIELDS = (
+    'minutiae', 'minutiae2', 'minutiae3',
+    'face_template_1', 'face_template_2', 'face_template_3', 'face_template_4', 'face_template_5',
+)
+VERSION_COUNTER = 'UserModule.MemberBiometrics'
+MOVE_BATCH_SIZE = 500
+
+
+def move_to_side_table(apps, schema_editor):
+    # Members with at least one template get a row, versioned from 1 in member order
+    GenMember = apps.get_model('UserModule', 'GenMember')
+    MemberBiometrics = apps.get_model('UserModule', 'MemberBiometrics')
+    IdAllocator = apps.get_model('UserModule', 'IdAllocator')
+    has_templates = Q()
+    for name in BIOMETRIC_FIELDS:
+        has_templates |= Q(**{f'{name}__isnull': False})
+    members = GenMember.objects.filter(has_templates).order_by('pk').values_list('pk', *BIOMETRIC_FIELDS)
+    version, batch = 0, []
+    for pk, *values in members.iterator(MOVE_BATCH_SIZE):
+        version += 1
+        batch.append(MemberBiometrics(member_id=pk, version=version, **dict(zip(BIOMETRIC_FIELDS, values))))
+        if len(batch) == MOVE_BATCH_SIZE:
+            MemberBiometrics.objects.bulk_create(batch)
+            batch = []
+    MemberBiometrics.objects.bulk_create(batch)
+    IdAllocator.objects.update_or_create(model=VERSION_COUNTER, defaults={'next_free': version + 1})
+
+
+def move_back(apps, schema_editor):
+    GenMember = apps.get_model('UserModule', 'GenMember')
+    MemberBiometrics = apps.get_model('UserModule', 'MemberBiometrics')
+    IdAllocator = apps.get_model('UserModule', 'IdAllocator')
+    rows = MemberBiometrics.objects.order_by('pk').values_list('member_id', *BIOMETRIC_FIELDS)
+    batch = []
+    for member_id, *values in rows.iterator(MOVE_BATCH_SIZE):
+        batch.append(GenMember(pk=member_id, **dict(zip(BIOMETRIC_FIELDS, values))))
+        if len(batch) == MOVE_BATCH_SIZE:
+            GenMember.objects.bulk_update(batch, BIOMETRIC_FIELDS)
+            batch = []
+    GenMember.objects.bulk_update(batch, BIOMETRIC_FIELDS)
+    IdAllocator.objects.filter(model=VERSION_COUNTER).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0026_person_photos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberBiometrics',
+            fields=[
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='biometrics', serialize=False, to='UserModule.genmember')),
+                ('minutiae', models.BinaryField(blank=True, null=True)),
+                ('minutiae2', models.BinaryField(blank=True, null=True)),
+                ('minutiae3', models.BinaryField(blank=True, null=True)),
+                ('face_template_1', models.BinaryField(blank=True, null=True)),
+                ('face_template_2', models.BinaryField(blank=True, null=True)),
+                ('face_template_3', models.BinaryField(blank=True, null=True)),
+                ('face_template_4', models.BinaryField(blank=True, null=True)),
+                ('face_template_5', models.BinaryField(blank=True, null=True)),
+                ('version', models.BigIntegerField(db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_to_side_table, move_back),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='face_template_1',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='face_template_2',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='face_template_3',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='face_template_4',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='face_template_5',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='minutiae',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='minutiae2',
+        ),
+        migrations.RemoveField(
+            model_name='genmember',
+            name='minutiae3',
+        ),
+    ]
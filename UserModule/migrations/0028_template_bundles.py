@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+def mark_blocked(apps, schema_editor):
+    # No device has synced yet, so the current versions stay
+    MemberBiometrics = apps.get_model('UserModule', 'MemberBiometrics')
+    MemberBiometrics.objects.filter(member__is_black_list=True).update(blocked=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0027_member_biometrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BiometricsRemoval',
+            fields=[
+                ('member_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='memberbiometrics',
+            name='blocked',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_blocked, migrations.RunPython.noop),
+    ]
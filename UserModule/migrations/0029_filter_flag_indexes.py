@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserModule', '0028_template_bundles'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='genmember',
+            index=models.Index(condition=models.Q(('is_black_list', True)), fields=['id'], name='genmember_blacklisted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='secuser',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['id'], name='secuser_inactive_idx'),
+        ),
+    ]
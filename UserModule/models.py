@@ -24,12 +24,16 @@ class GenMembershipType(models.Model):
 class SecUser(models.Model):
     id = models.BigIntegerField(primary_key=True)
     person = models.ForeignKey('GenPerson', null=True, blank=True, on_delete=models.SET_NULL, related_name='users')
-    username = models.CharField(max_length=255, null=True, blank=True)
+    username = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     password = models.CharField(max_length=255, null=True, blank=True)
     is_admin = models.BooleanField(default=False)
     shift = models.ForeignKey(GenShift, null=True, blank=True, on_delete=models.SET_NULL, related_name='users')
     is_active = models.BooleanField(default=True)
-    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True)
+    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True, db_index=True)
+
+    class Meta:
+        # Serves is_active filters for the few deactivated users, in id order
+        indexes = [models.Index(fields=['id'], condition=models.Q(is_active=False), name='secuser_inactive_idx')]
 
     def __str__(self):
         return self.username or f"User {self.id}"
@@ -46,35 +50,39 @@ class GenPerson(models.Model):
     full_name = models.CharField(max_length=510, null=True, blank=True)
     father_name = models.CharField(max_length=255, null=True, blank=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, null=True, blank=True)
-    national_code = models.CharField(max_length=50, null=True, blank=True)
+    national_code = models.CharField(max_length=50, null=True, blank=True, db_index=True)
     nidentity = models.CharField(max_length=50, null=True, blank=True)
     person_image = models.BinaryField(null=True, blank=True)
     thumbnail_image = models.BinaryField(null=True, blank=True)
-    birth_date = models.CharField(max_length=510, null=True, blank=True)
+    birth_date = models.DateField(null=True, blank=True, db_index=True)
     tel = models.CharField(max_length=50, null=True, blank=True)
-    mobile = models.CharField(max_length=50, null=True, blank=True)
+    mobile = models.CharField(max_length=50, null=True, blank=True, db_index=True)
     email = models.EmailField(null=True, blank=True)
     education = models.CharField(max_length=255, null=True, blank=True)
     job = models.CharField(max_length=255, null=True, blank=True)
     has_insurance = models.BooleanField(null=True, default=False)
     insurance_no = models.CharField(max_length=50, null=True, blank=True)
-    ins_start_date = models.CharField(max_length=510, null=True, blank=True)
-    ins_end_date = models.CharField(max_length=510, null=True, blank=True)
+    ins_start_date = models.DateField(null=True, blank=True, db_index=True)
+    ins_end_date = models.DateField(null=True, blank=True, db_index=True)
     address = models.TextField(null=True, blank=True)
     has_parrent = models.BooleanField(default=False)
     team_name = models.CharField(max_length=255, null=True, blank=True)
     shift = models.ForeignKey('GenShift', null=True, blank=True, on_delete=models.SET_NULL, related_name='people')
     user = models.ForeignKey('SecUser', null=True, blank=True, on_delete=models.SET_NULL, related_name='people_created')
-    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True)
+    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True, db_index=True)
     modifier = models.CharField(max_length=255, null=True, blank=True)
-    modification_datetime = models.CharField(max_length=510, null=True, blank=True)
+    modification_datetime = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Set by UserModule.photos from person_image; a null digest means the derived data is missing or stale
+    photo_digest = models.CharField(max_length=32, null=True, blank=True)
+    photo_type = models.CharField(max_length=50, null=True, blank=True)
+    photo_updated_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.full_name or f"Person {self.id}"
 
 class GenMember(models.Model):
     id = models.BigIntegerField(primary_key=True)
-    card_no = models.CharField(max_length=50, null=True, blank=True)
+    card_no = models.CharField(max_length=50, null=True, blank=True, db_index=True)
     couch_id = models.IntegerField(null=True, blank=True)
     person = models.ForeignKey(GenPerson, null=True, blank=True, on_delete=models.SET_NULL, related_name='members')
     role = models.ForeignKey(GenPersonRole, null=True, blank=True, on_delete=models.SET_NULL, related_name='members')
@@ -83,22 +91,84 @@ class GenMember(models.Model):
     is_black_list = models.BooleanField(default=False)
     box_radif_no = models.CharField(max_length=50, null=True, blank=True)
     has_finger = models.BooleanField(default=True, null=True, blank=True)
-    membership_datetime = models.CharField(max_length=255, null=True, blank=True)
+    membership_datetime = models.DateTimeField(null=True, blank=True, db_index=True)
     modifier = models.CharField(max_length=255, null=True, blank=True)
-    modification_datetime = models.CharField(max_length=255, null=True, blank=True)
+    modification_datetime = models.DateTimeField(null=True, blank=True, db_index=True)
     is_family = models.BooleanField(default=False, null=True, blank=True)
     max_debit = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    salary = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True, db_index=True)
+    section_left = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        # Serves is_black_list filters for the few blacklisted members, in id order
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(is_black_list=True), name='genmember_blacklisted_idx'),
+        ]
+
+    def __str__(self):
+        return f"Member {self.id} - {self.card_no}"
+
+class MemberBiometrics(models.Model):
+    # Fingerprint and face templates of a member, kept out of the member row so only enrollment and matching
+    # read them. `version` comes from one counter for all members (UserModule.biometrics), so devices can
+    # fetch the templates changed since the last version they saw.
+    member = models.OneToOneField(GenMember, primary_key=True, on_delete=models.CASCADE, related_name='biometrics')
     minutiae = models.BinaryField(null=True, blank=True)
     minutiae2 = models.BinaryField(null=True, blank=True)
     minutiae3 = models.BinaryField(null=True, blank=True)
-    salary = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     face_template_1 = models.BinaryField(null=True, blank=True)
     face_template_2 = models.BinaryField(null=True, blank=True)
     face_template_3 = models.BinaryField(null=True, blank=True)
     face_template_4 = models.BinaryField(null=True, blank=True)
     face_template_5 = models.BinaryField(null=True, blank=True)
-    creation_datetime = models.DateTimeField(null=True, blank=True, auto_now_add=True)
-    section_left = models.IntegerField(null=True, blank=True)
+    version = models.BigIntegerField(db_index=True)
+    # The member's blacklist status as of `version`; a change gets a new version, so devices drop or restore them
+    blocked = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Biometrics of member {self.member_id} (v{self.version})"
+
+class BiometricsRemoval(models.Model):
+    # Members whose templates were deleted, at the version of the deletion, so devices syncing changes drop them
+    member_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"Biometrics of member {self.member_id} removed (v{self.version})"
+
+class PersonThumbnail(models.Model):
+    # Fixed-size AVIF renditions of GenPerson.person_image, rebuilt by UserModule.photos when the photo changes
+    person = models.ForeignKey(GenPerson, on_delete=models.CASCADE, related_name='thumbnails')
+    size = models.PositiveSmallIntegerField()
+    image = models.BinaryField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['person', 'size'], name='unique_person_thumbnail_size')]
+
+    def __str__(self):
+        return f"Thumbnail {self.size}px of person {self.person_id}"
+
+class IdAllocator(models.Model):
+    # Per-model allocation state for DynamicAPIView.post: every id below next_free is known to be taken
+    model = models.CharField(max_length=100, unique=True)
+    next_free = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.model}: next free id >= {self.next_free}"
+
+class UnparsedLegacyDate(models.Model):
+    # Text dates migration 0025 could not read: the typed column is left NULL and the original is kept here
+    model = models.CharField(max_length=100)
+    row_id = models.BigIntegerField()
+    field = models.CharField(max_length=100)
+    value = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'row_id', 'field'], name='unique_unparsed_legacy_date'),
+        ]
 
     def __str__(self):
-        return f"Member {self.id} - {self.card_no}"
\ No newline at end of file
+        return f"{self.model} {self.row_id} {self.field}: {self.value!r}"
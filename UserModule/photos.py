@@ -0,0 +1,67 @@
+import hashlib
+import io
+
+import pillow_avif  # noqa: F401 - registers the AVIF plugin with Pillow
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import GenPerson, PersonThumbnail
+
+# Person photos are served as binary by PersonPhotoAPIView. Alongside person_image we keep its digest (the
+# ETag), its content type, when it last changed (Last-Modified) and AVIF thumbnails in THUMBNAIL_SIZES,
+# each fitting a size x size box. A URL carrying the current digest as `v` never changes content, so it is
+# cached for PHOTO_MAX_AGE; other requests revalidate.
+THUMBNAIL_SIZES = (64, 160, 320)
+THUMBNAIL_QUALITY = 60
+PHOTO_MAX_AGE = 365 * 24 * 3600
+
+
+def photo_digest(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def make_thumbnails(data):
+    # Returns (content type of the original, {size: AVIF bytes}); bytes Pillow cannot read get no thumbnails
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            content_type = Image.MIME.get(image.format, 'application/octet-stream')
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            thumbnails = {}
+            for size in THUMBNAIL_SIZES:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                output = io.BytesIO()
+                thumbnail.save(output, 'AVIF', quality=THUMBNAIL_QUALITY)
+                thumbnails[size] = output.getvalue()
+    except (UnidentifiedImageError, OSError, ValueError):
+        return 'application/octet-stream', {}
+    return content_type, thumbnails
+
+
+def refresh_photo(person_id, data, known_digest=None):
+    # Rebuilds the derived photo data of a person if `data` (their person_image) is not what it was made from.
+    # Returns the digest, or None when the person has no photo.
+    digest = photo_digest(bytes(data)) if data else None
+    if digest == known_digest:
+        return digest
+
+    content_type, thumbnails = make_thumbnails(bytes(data)) if data else (None, {})
+    with transaction.atomic():
+        # Concurrent refreshes of one person take turns on its row
+        list(GenPerson.objects.select_for_update().filter(pk=person_id).values_list('pk'))
+        PersonThumbnail.objects.filter(person_id=person_id).delete()
+        PersonThumbnail.objects.bulk_create([
+            PersonThumbnail(person_id=person_id, size=size, image=image) for size, image in thumbnails.items()
+        ])
+        GenPerson.objects.filter(pk=person_id).update(
+            photo_digest=digest, photo_type=content_type, photo_updated_at=timezone.now() if data else None,
+        )
+    return digest
+
+
+def refresh_photos(person_ids):
+    for person_id, data, digest in (
+        GenPerson.objects.filter(pk__in=person_ids).values_list('pk', 'person_image', 'photo_digest').iterator()
+    ):
+        refresh_photo(person_id, data, digest)
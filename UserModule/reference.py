@@ -0,0 +1,54 @@
+import hashlib
+import threading
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from .models import GenMembershipType, GenPersonRole, GenShift
+
+# Per-process cache of DynamicAPIView.get payloads for the small, rarely edited lookup tables, keyed by query.
+# Writes clear it in the process that made them once they commit; other processes pick the change up within
+# REFERENCE_CACHE_TTL.
+# The ETag is a hash of the payload, so it is the same in every process and changes only with the data.
+REFERENCE_MODELS = (GenShift, GenPersonRole, GenMembershipType)
+REFERENCE_CACHE_TTL = 60
+MAX_CACHED_RESPONSES = 1_000
+
+_responses = {}
+_generation = 0
+_lock = threading.Lock()
+
+
+def reference_key(model, query_params):
+    return model._meta.label, tuple(sorted((key, tuple(values)) for key, values in query_params.lists()))
+
+
+def payload_etag(data):
+    return '"%s"' % hashlib.md5(JSONRenderer().render(data)).hexdigest()
+
+
+def cached_reference(key, load):
+    # Returns (etag, payload). `load` builds the payload on a miss; it may return None (an error), which is not cached.
+    cached = _responses.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    generation = _generation
+    data = load()
+    if data is None:
+        return None
+    entry = (payload_etag(data), data)
+    with _lock:
+        # A payload built while the cache was being cleared may already be stale
+        if generation == _generation:
+            if len(_responses) >= MAX_CACHED_RESPONSES:
+                _responses.clear()
+            _responses[key] = (time.monotonic() + REFERENCE_CACHE_TTL, entry)
+    return entry
+
+
+def forget_references():
+    global _generation
+    with _lock:
+        _generation += 1
+        _responses.clear()
@@ -0,0 +1,96 @@
+from django.db import connection
+from django.db.models import Q
+
+from .models import GenMember, GenPerson
+
+# Arabic letters typed by Arabic keyboards -> their Persian forms, Arabic-Indic and Persian digits -> ASCII,
+# ZWNJ -> space; tatweel and short vowel marks are dropped. Must match usermodule_normalize_search()
+# from migration 0022, which the search indexes are built on.
+NORMALIZE_FROM = (
+    'يىكةۀأإآ'
+    '٠١٢٣٤٥٦٧٨٩'
+    '۰۱۲۳۴۵۶۷۸۹'
+    '\u200c'
+    '\u0640\u064b\u064c\u064d\u064e\u064f\u0650\u0651\u0652'
+)
+NORMALIZE_TO = (
+    'ییکههااا'
+    '0123456789'
+    '0123456789'
+    ' '
+)
+NORMALIZE_TABLE = str.maketrans(NORMALIZE_FROM[:len(NORMALIZE_TO)], NORMALIZE_TO, NORMALIZE_FROM[len(NORMALIZE_TO):])
+
+MIN_QUERY_LENGTH = 2
+# pg_trgm pads words to make trigrams, so a shorter query extracts none the GIN indexes can look up
+TRIGRAM_QUERY_LENGTH = 3
+
+
+def normalize_search(value):
+    return (value or '').translate(NORMALIZE_TABLE).lower().strip()
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_people(query, offset, limit):
+    # Returns [(person id, rank)] best match first. A person matches when the query is a substring of
+    # (or, on PostgreSQL, a close trigram match for) their name, mobile or national code, or a substring
+    # of the card number of one of their memberships. On PostgreSQL, queries shorter than
+    # TRIGRAM_QUERY_LENGTH only match as a prefix, see prefix_search.
+    query = normalize_search(query)
+    if connection.vendor != 'postgresql':
+        return fallback_search(query, offset, limit)
+    if len(query) < TRIGRAM_QUERY_LENGTH:
+        return prefix_search(query, offset, limit)
+
+    qn = connection.ops.quote_name
+    person_text = "usermodule_person_search_text(p.full_name, p.mobile, p.national_code)"
+    card_text = "usermodule_normalize_search(m.card_no)"
+    # Both match conditions are served by the trigram GIN indexes of migration 0022
+    sql = f"""
+        SELECT id, MAX(rank) AS rank FROM (
+            SELECT p.id, word_similarity(%s, {person_text}) AS rank
+            FROM {qn(GenPerson._meta.db_table)} p
+            WHERE {person_text} LIKE %s OR %s <%% {person_text}
+            UNION ALL
+            SELECT m.person_id, CASE WHEN {card_text} = %s THEN 1 ELSE word_similarity(%s, {card_text}) END
+            FROM {qn(GenMember._meta.db_table)} m
+            WHERE m.person_id IS NOT NULL AND {card_text} LIKE %s
+        ) matches
+        GROUP BY id
+        ORDER BY rank DESC, id
+        LIMIT %s OFFSET %s
+    """
+    pattern = f"%{escape_like(query)}%"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, pattern, query, query, query, pattern, limit, offset])
+        return [(person_id, float(rank)) for person_id, rank in cursor.fetchall()]
+
+
+def prefix_search(query, offset, limit):
+    # Queries too short for the trigram indexes match the start of a mobile, national code or card number
+    # instead, each served by its column's btree pattern index; every match ranks the same
+    matches = (
+        GenPerson.objects.filter(mobile__startswith=query).values_list('id', flat=True)
+        .union(
+            GenPerson.objects.filter(national_code__startswith=query).values_list('id', flat=True),
+            GenMember.objects.filter(card_no__startswith=query, person__isnull=False)
+            .values_list('person_id', flat=True),
+        )
+        .order_by('id')
+    )
+    return [(person_id, 1.0) for person_id in matches[offset:offset + limit]]
+
+
+def fallback_search(query, offset, limit):
+    # Unindexed substring search for development databases; every match ranks the same
+    matches = (
+        GenPerson.objects.filter(
+            Q(full_name__icontains=query) | Q(mobile__icontains=query) | Q(national_code__icontains=query)
+            | Q(members__card_no__icontains=query)
+        )
+        .order_by('id').values_list('id', flat=True).distinct()
+    )
+    return [(person_id, 1.0) for person_id in matches[offset:offset + limit]]
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 import base64
+from .biometrics import write_biometrics
+from .dates import parse_legacy_date, parse_legacy_datetime
 from .models import GenShift, SecUser, GenPerson, GenPersonRole, GenMember, GenMembershipType
 
 
@@ -16,13 +18,38 @@ class Base64BinaryField(serializers.Field):
         return None
 
 
-class GenShiftSerializer(serializers.ModelSerializer):
+class LegacyDateField(serializers.DateField):
+    # Also accepts the legacy formats, e.g. Jalali dates like 1370/01/01
+    def to_internal_value(self, value):
+        parsed = parse_legacy_date(value) if isinstance(value, str) else None
+        return parsed if parsed is not None else super().to_internal_value(value)
+
+
+class LegacyDateTimeField(serializers.DateTimeField):
+    def to_internal_value(self, value):
+        parsed = parse_legacy_datetime(value) if isinstance(value, str) else None
+        return parsed if parsed is not None else super().to_internal_value(value)
+
+
+class DynamicFieldsMixin:
+    # Pass `fields` to serialize only those fields (in their declared order), and `expand` ({field: serializer})
+    # to inline related objects in place of their ids
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name, serializer in (expand or {}).items():
+            self.fields[name] = serializer
+
+
+class GenShiftSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = GenShift
         fields = ['id', 'shift_desc']
 
 
-class SecUserSerializer(serializers.ModelSerializer):
+class SecUserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     creation_datetime = serializers.DateTimeField(read_only=True)
 
     class Meta:
@@ -30,10 +57,15 @@ class SecUserSerializer(serializers.ModelSerializer):
         fields = ['id', 'person', 'username', 'password', 'is_admin', 'shift', 'is_active', 'creation_datetime']
 
 
-class GenPersonSerializer(serializers.ModelSerializer):
+class GenPersonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     creation_datetime = serializers.DateTimeField(read_only=True)
     person_image = Base64BinaryField(required=False, allow_null=True)
     thumbnail_image = Base64BinaryField(required=False, allow_null=True)
+    birth_date = LegacyDateField(required=False, allow_null=True)
+    ins_start_date = LegacyDateField(required=False, allow_null=True)
+    ins_end_date = LegacyDateField(required=False, allow_null=True)
+    modification_datetime = LegacyDateTimeField(required=False, allow_null=True)
+    photo_digest = serializers.CharField(read_only=True)
 
     class Meta:
         model = GenPerson
@@ -41,25 +73,28 @@ class GenPersonSerializer(serializers.ModelSerializer):
             'id', 'first_name', 'last_name', 'full_name', 'father_name', 'gender', 'national_code', 'nidentity',
             'person_image', 'thumbnail_image', 'birth_date', 'tel', 'mobile', 'email', 'education', 'job',
             'has_insurance', 'insurance_no', 'ins_start_date', 'ins_end_date', 'address', 'has_parrent',
-            'team_name', 'shift', 'user', 'creation_datetime', 'modifier', 'modification_datetime'
+            'team_name', 'shift', 'user', 'creation_datetime', 'modifier', 'modification_datetime', 'photo_digest'
         ]
 
 
-class GenPersonRoleSerializer(serializers.ModelSerializer):
+class GenPersonRoleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = GenPersonRole
         fields = ['id', 'role_desc']
 
 
-class GenMemberSerializer(serializers.ModelSerializer):
-    face_template_1 = Base64BinaryField(required=False)
-    face_template_2 = Base64BinaryField(required=False)
-    face_template_3 = Base64BinaryField(required=False)
-    face_template_4 = Base64BinaryField(required=False)
-    face_template_5 = Base64BinaryField(required=False)
-    minutiae = Base64BinaryField(required=False)
-    minutiae2 = Base64BinaryField(required=False)
-    minutiae3 = Base64BinaryField(required=False)
+class GenMemberSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # The templates live in MemberBiometrics; they are only read when selected, and written there
+    face_template_1 = Base64BinaryField(source='biometrics.face_template_1', required=False, allow_null=True)
+    face_template_2 = Base64BinaryField(source='biometrics.face_template_2', required=False, allow_null=True)
+    face_template_3 = Base64BinaryField(source='biometrics.face_template_3', required=False, allow_null=True)
+    face_template_4 = Base64BinaryField(source='biometrics.face_template_4', required=False, allow_null=True)
+    face_template_5 = Base64BinaryField(source='biometrics.face_template_5', required=False, allow_null=True)
+    minutiae = Base64BinaryField(source='biometrics.minutiae', required=False, allow_null=True)
+    minutiae2 = Base64BinaryField(source='biometrics.minutiae2', required=False, allow_null=True)
+    minutiae3 = Base64BinaryField(source='biometrics.minutiae3', required=False, allow_null=True)
+    membership_datetime = LegacyDateTimeField(required=False, allow_null=True)
+    modification_datetime = LegacyDateTimeField(required=False, allow_null=True)
 
     class Meta:
         model = GenMember
@@ -71,9 +106,23 @@ class GenMemberSerializer(serializers.ModelSerializer):
             'section_left'
         ]
 
+    def create(self, validated_data):
+        biometrics = validated_data.pop('biometrics', None)
+        member = super().create(validated_data)
+        if biometrics:
+            write_biometrics({member.pk: biometrics})
+        return member
+
+    def update(self, instance, validated_data):
+        biometrics = validated_data.pop('biometrics', None)
+        member = super().update(instance, validated_data)
+        if biometrics:
+            write_biometrics({member.pk: biometrics})
+        return member
+
 
 
-class GenMembershipTypeSerializer(serializers.ModelSerializer):
+class GenMembershipTypeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = GenMembershipType
         fields = ['id', 'membership_type_desc']
@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from .access import forget_cards
+from .allocator import ALLOCATED_MODELS, release_id
+from .biometrics import record_removals, sync_blocked
+from .models import GenMember, GenPerson, MemberBiometrics
+from .photos import refresh_photo, refresh_photos
+from .reference import REFERENCE_MODELS, forget_references
+
+# Sent after bulk creates and updates, which send no post_save; `ids` are the primary keys written
+bulk_saved = Signal()
+
+
+def free_deleted_id(sender, instance, **kwargs):
+    release_id(sender, instance.pk)
+
+
+def clear_card_cache(sender, **kwargs):
+    # Once committed: cleared earlier, a concurrent lookup could cache the member as it was before the write
+    transaction.on_commit(forget_cards)
+
+
+def clear_reference_cache(sender, **kwargs):
+    # Once committed, or a concurrent request could cache the table as it was before the write
+    transaction.on_commit(forget_references)
+
+
+def refresh_person_photo(sender, instance, update_fields=None, **kwargs):
+    deferred = instance.get_deferred_fields()
+    if 'person_image' in deferred or (update_fields is not None and 'person_image' not in update_fields):
+        return
+    known = None if 'photo_digest' in deferred else instance.photo_digest
+    instance.photo_digest = refresh_photo(instance.pk, instance.person_image, known)
+
+
+def refresh_bulk_photos(sender, ids, **kwargs):
+    refresh_photos(ids)
+
+
+def sync_member_block(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'is_black_list' in update_fields:
+        sync_blocked([instance.pk])
+
+
+def sync_member_blocks(sender, ids, **kwargs):
+    sync_blocked(ids)
+
+
+def record_biometrics_removal(sender, instance, **kwargs):
+    record_removals([instance.member_id])
+
+
+def connect_signals():
+    for model in ALLOCATED_MODELS:
+        post_delete.connect(free_deleted_id, sender=model, dispatch_uid=f'allocator-delete-{model._meta.label}')
+    for model in (GenMember, GenPerson):
+        post_save.connect(clear_card_cache, sender=model, dispatch_uid=f'card-cache-save-{model._meta.label}')
+        post_delete.connect(clear_card_cache, sender=model, dispatch_uid=f'card-cache-delete-{model._meta.label}')
+        bulk_saved.connect(clear_card_cache, sender=model, dispatch_uid=f'card-cache-bulk-{model._meta.label}')
+    for model in REFERENCE_MODELS:
+        post_save.connect(clear_reference_cache, sender=model, dispatch_uid=f'reference-save-{model._meta.label}')
+        post_delete.connect(clear_reference_cache, sender=model, dispatch_uid=f'reference-delete-{model._meta.label}')
+        bulk_saved.connect(clear_reference_cache, sender=model, dispatch_uid=f'reference-bulk-{model._meta.label}')
+    post_save.connect(refresh_person_photo, sender=GenPerson, dispatch_uid='person-photo-save')
+    bulk_saved.connect(refresh_bulk_photos, sender=GenPerson, dispatch_uid='person-photo-bulk')
+    post_save.connect(sync_member_block, sender=GenMember, dispatch_uid='biometrics-block-save')
+    bulk_saved.connect(sync_member_blocks, sender=GenMember, dispatch_uid='biometrics-block-bulk')
+    post_delete.connect(record_biometrics_removal, sender=MemberBiometrics, dispatch_uid='biometrics-delete')
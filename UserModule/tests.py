@@ -1,3 +1,316 @@
-from django.test import TestCase
+import base64
+from datetime import date, datetime, timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from GymAutomation.pagination import encode_cursor
+from GymAutomation.readers import values_reader
+from LockerModule.models import Locker
+from LockerModule.serializers import LockerSerializer
+from LogModule.models import Log
+from LogModule.serializers import LogSerializer
+from PaymentModule.models import Payment
+from PaymentModule.serializers import PaymentSerializer
+from .allocator import allocate_ids
+from .biometrics import write_biometrics
+from .dates import parse_legacy, parse_legacy_date, parse_legacy_datetime
+from .models import GenMember, GenPerson, GenPersonRole, GenShift, SecUser
+from .serializers import GenMemberSerializer, GenPersonSerializer, SecUserSerializer
+
+
+class ValuesReaderParityTests(TestCase):
+    # The values_list read path must produce exactly what the serializers do
+    @classmethod
+    def setUpTestData(cls):
+        shift = GenShift.objects.create(id=1, shift_desc='Morning')
+        role = GenPersonRole.objects.create(id=1, role_desc='Athlete')
+        user = SecUser.objects.create(id=1, username='admin', password='x', is_admin=True, shift=shift)
+        person = GenPerson.objects.create(
+            id=1, first_name='Sara', last_name='Ahmadi', full_name='Sara Ahmadi', father_name='Ali', gender='F',
+            national_code='0012345678', person_image=b'\x89PNG\r\n\x00image', thumbnail_image=b'thumb',
+            birth_date=date(1991, 3, 21), mobile='09120000000', email='sara@example.com', has_insurance=None,
+            ins_start_date=date(2024, 1, 1), ins_end_date=date(2025, 1, 1), address='Tehran\nIran',
+            shift=shift, user=user, modifier='admin',
+            modification_datetime=datetime(2024, 5, 1, 10, 30, 15, 250000, tzinfo=timezone.utc),
+        )
+        empty_person = GenPerson.objects.create(id=2)
+        member = GenMember.objects.create(
+            id=10, card_no='C-10', person=person, role=role, user=user, shift=shift, is_black_list=True,
+            has_finger=None, membership_datetime=datetime(2023, 9, 1, 8, 0, tzinfo=timezone.utc),
+            max_debit=Decimal('12.5'), salary=Decimal('0'), couch_id=3, is_family=None, section_left=-2,
+        )
+        GenMember.objects.create(id=11, person=empty_person)
+        write_biometrics({member.pk: {'minutiae': b'\x00\x01\x02', 'face_template_3': b'face'}})
+
+        Log.objects.create(user=member, full_name='Sara Ahmadi')
+        Log.objects.create(user=member, is_online=False)
+        Payment.objects.create(user=person, price=150000, duration='1 month', paid_method='card', full_name='Sara')
+        Payment.objects.create()
+        Locker.objects.create(is_vip=True, log=[{'full_name': 'Sara Ahmadi', 'datetime': '2025-05-08T12:30:00'}],
+                              user=person, full_name='Sara Ahmadi')
+        Locker.objects.create(log={'nested': {'count': 2, 'ok': True}})
+        Locker.objects.create()
+
+    def assertSameOutput(self, serializer_class, queryset, fields=None):
+        kwargs = {} if fields is None else {'fields': fields}
+        expected = serializer_class(queryset, many=True, **kwargs).data
+        actual = values_reader(serializer_class, fields).read(queryset)
+        self.assertEqual(actual, expected)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_member(self):
+        self.assertSameOutput(GenMemberSerializer, GenMember.objects.order_by('id'))
+
+    def test_member_field_subset(self):
+        self.assertSameOutput(
+            GenMemberSerializer, GenMember.objects.order_by('id'), ('card_no', 'face_template_3', 'max_debit'),
+        )
+
+    def test_person(self):
+        self.assertSameOutput(GenPersonSerializer, GenPerson.objects.order_by('id'))
+
+    def test_person_field_subset(self):
+        self.assertSameOutput(GenPersonSerializer, GenPerson.objects.order_by('id'), ('birth_date', 'gender'))
+
+    def test_user(self):
+        self.assertSameOutput(SecUserSerializer, SecUser.objects.order_by('id'))
+
+    def test_log(self):
+        self.assertSameOutput(LogSerializer, Log.objects.order_by('id'))
+
+    def test_payment(self):
+        self.assertSameOutput(PaymentSerializer, Payment.objects.order_by('id'))
+
+    def test_locker(self):
+        self.assertSameOutput(LockerSerializer, Locker.objects.order_by('id'))
+
+    def test_dynamic_list_matches_serializer(self):
+        response = self.client.get('/api/dynamic/', {'action': 'member', 'exclude': 'person'})
+        expected = GenMemberSerializer(
+            GenMember.objects.order_by('id'), many=True,
+            fields=[name for name in GenMemberSerializer.Meta.fields if name != 'person'],
+        ).data
+        self.assertEqual(sorted(response.json()['items'], key=lambda item: item['id']), expected)
+
+    def test_cursor_page_without_key_field(self):
+        response = self.client.get('/api/dynamic/', {'action': 'member', 'fields': 'card_no', 'cursor': '',
+                                                     'limit': 1, 'count': 'none'})
+        body = response.json()
+        self.assertEqual(body['items'], [{'card_no': 'C-10'}])
+        response = self.client.get('/api/dynamic/', {'action': 'member', 'fields': 'card_no',
+                                                     'cursor': body['next'], 'limit': 1, 'count': 'none'})
+        self.assertEqual(response.json()['items'], [{'card_no': None}])
+
+
+class BatchAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.morning = GenShift.objects.create(id=1, shift_desc='Morning')
+        cls.evening = GenShift.objects.create(id=2, shift_desc='Evening')
+        for member_id in (1, 2, 3):
+            GenMember.objects.create(id=member_id, card_no=f'C-{member_id}', shift=cls.morning)
+
+    def post(self, *operations):
+        return self.client.post('/api/dynamic/batch/?action=member', {'operations': list(operations)},
+                                content_type='application/json')
+
+    def test_updates_write_only_their_own_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(
+                {'op': 'update', 'id': 1, 'data': {'shift': 2}},
+                {'op': 'update', 'id': 2, 'data': {'card_no': 'C-20'}},
+            )
+        self.assertEqual(response.status_code, 200)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "UserModule_genmember"')]
+        self.assertEqual(len(updates), 2)
+        self.assertFalse(any('"card_no"' in sql and '"shift_id"' in sql for sql in updates))
+        if connection.features.has_select_for_update:
+            # The rows are read under a lock, so nothing committed meanwhile is overwritten
+            self.assertTrue(any(
+                q['sql'].startswith('SELECT') and '"UserModule_genmember"' in q['sql'] and 'FOR UPDATE' in q['sql']
+                for q in queries.captured_queries
+            ))
+        self.assertEqual(
+            list(GenMember.objects.order_by('id').values_list('id', 'card_no', 'shift_id')),
+            [(1, 'C-1', 2), (2, 'C-20', 1), (3, 'C-3', 1)],
+        )
+
+    def test_invalid_operation_rolls_back_the_batch(self):
+        response = self.post(
+            {'op': 'delete', 'id': 1},
+            {'op': 'update', 'id': 2, 'data': {'shift': 99}},
+            {'op': 'create', 'data': {'card_no': 'C-new'}},
+            {'op': 'update', 'id': 404, 'data': {'card_no': 'x'}},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 3])
+        self.assertEqual(
+            list(GenMember.objects.order_by('id').values_list('id', 'card_no', 'shift_id')),
+            [(1, 'C-1', 1), (2, 'C-2', 1), (3, 'C-3', 1)],
+        )
+
+    def test_create_does_not_reuse_an_id_deleted_in_the_batch(self):
+        response = self.post({'op': 'delete', 'id': 3}, {'op': 'create', 'data': {'card_no': 'C-new'}})
+        self.assertEqual(response.status_code, 200)
+        deleted, created = response.json()['results']
+        self.assertEqual((deleted['id'], deleted['status']), (3, 'deleted'))
+        self.assertEqual(created['status'], 'created')
+        self.assertNotEqual(created['id'], 3)
+        self.assertEqual(GenMember.objects.get(id=created['id']).card_no, 'C-new')
+        self.assertFalse(GenMember.objects.filter(id=3).exists())
+
+
+class IdAllocationTests(TestCase):
+    # Shifts 1, 2, 3, 5 and 8 exist; creates take the lowest free id
+    @classmethod
+    def setUpTestData(cls):
+        GenShift.objects.bulk_create([GenShift(id=pk, shift_desc=f'Shift {pk}') for pk in (1, 2, 3, 5, 8)])
+
+    def create(self, **data):
+        response = self.client.post('/api/dynamic/?action=shift', {'shift_desc': 'New', **data},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def test_fills_gaps_in_order(self):
+        self.assertEqual([self.create() for _ in range(4)], [4, 6, 7, 9])
+
+    def test_deleted_id_is_reused(self):
+        self.assertEqual(self.create(), 4)
+        response = self.client.delete('/api/dynamic/?action=shift&id=2')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual([self.create(), self.create()], [2, 6])
+
+    def test_explicit_id(self):
+        # A taken id moves up to the next free one; ids skipped that way are still handed out later
+        self.assertEqual(self.create(id=3), 4)
+        self.assertEqual(self.create(id=20), 20)
+        self.assertEqual([self.create(), self.create(), self.create()], [6, 7, 9])
+
+    def test_bulk_allocation(self):
+        ids = allocate_ids(GenShift, 4)
+        self.assertEqual(ids, [4, 6, 7, 9])
+        GenShift.objects.bulk_create([GenShift(id=pk, shift_desc='New') for pk in ids])
+        GenShift.objects.filter(pk=1).delete()
+        self.assertEqual(allocate_ids(GenShift, 2), [1, 10])
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        GenPerson.objects.bulk_create([GenPerson(id=pk, full_name=f'Person {pk}') for pk in (1, 2, 3, 5, 7)])
+
+    def page(self, cursor='', **params):
+        response = self.client.get('/api/dynamic/', {'action': 'person', 'limit': 2, 'cursor': cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [item['id'] for item in data['items']], data
+
+    def test_latest_next_and_prev(self):
+        ids, first = self.page(order_by='latest', count='exact')
+        self.assertEqual((ids, first['prev'], first['total_items']), ([7, 5], None, 5))
+        ids, second = self.page(first['next'], order_by='latest')
+        self.assertEqual(ids, [3, 2])
+        ids, last = self.page(second['next'], order_by='latest')
+        self.assertEqual((ids, last['next']), ([1], None))
+
+        ids, back = self.page(last['prev'], order_by='latest')
+        self.assertEqual(ids, [3, 2])
+        ids, start = self.page(back['prev'], order_by='latest')
+        self.assertEqual((ids, start['prev']), ([7, 5], None))
+        self.assertEqual(self.page(start['next'], order_by='latest')[0], [3, 2])
+
+    def test_ascending_by_default(self):
+        ids, first = self.page(count='none')
+        self.assertEqual(ids, [1, 2])
+        self.assertNotIn('total_items', first)
+        self.assertNotIn('estimated_total', first)
+        self.assertEqual(self.page(first['next'])[0], [3, 5])
+
+    def test_bad_parameters(self):
+        tokens = [
+            'not a cursor!',
+            encode_cursor('5', 'next'),
+            encode_cursor(5, 'sideways'),
+            base64.urlsafe_b64encode(b'[5]').decode(),
+        ]
+        for params in [{'cursor': token} for token in tokens] + [{'count': 'all'}, {'limit': 0}, {'limit': 'x'}]:
+            with self.subTest(params=params):
+                response = self.client.get('/api/dynamic/', {'action': 'person', 'cursor': '', **params})
+                self.assertEqual(response.status_code, 400)
+
+
+class DateRangeFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        joined = {1: datetime(2024, 3, 20, 23, 30), 2: datetime(2024, 3, 21), 3: datetime(2024, 3, 19, 12)}
+        for pk, moment in joined.items():
+            GenMember.objects.create(id=pk, card_no=f'C-{pk}', membership_datetime=moment.replace(tzinfo=timezone.utc))
+        GenPerson.objects.create(id=1, birth_date=date(2000, 1, 1))
+
+    def ids(self, action, **params):
+        response = self.client.get('/api/dynamic/', {'action': action, 'order_by': 'earlier', **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['items']]
+
+    def test_date_only_upper_bound_includes_the_day(self):
+        self.assertEqual(self.ids('member', membership_datetime__range=',2024-03-20'), [1, 3])
+        self.assertEqual(self.ids('member', membership_datetime__range='2024-03-20,1403/01/01'), [1])
+        self.assertEqual(self.ids('member', membership_datetime__range='2024-03-21,'), [2])
+
+    def test_datetime_upper_bound_is_inclusive(self):
+        self.assertEqual(self.ids('member', membership_datetime__range=',2024-03-20 23:00'), [3])
+        self.assertEqual(self.ids('member', membership_datetime__range=',2024-03-20 23:30'), [1, 3])
+
+    def test_date_field_bounds(self):
+        self.assertEqual(self.ids('person', birth_date__range='2000-01-01,2000-01-01'), [1])
+        self.assertEqual(self.ids('person', birth_date__range=',1378/10/10'), [])
+
+    def test_rejected_bounds(self):
+        for value in [',03/20/2024', '2024-03-20', ',', '1402/12/30,']:
+            with self.subTest(value=value):
+                response = self.client.get('/api/dynamic/', {'action': 'member', 'membership_datetime__range': value})
+                self.assertEqual(response.status_code, 400)
+
+
+class LegacyDateTests(SimpleTestCase):
+    def test_gregorian(self):
+        self.assertEqual(parse_legacy('2024-03-20'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy('20240320'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy('20.03.2024'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy('2024/03/20 08:05:09.5'), datetime(2024, 3, 20, 8, 5, 9, 500000))
+
+    def test_jalali(self):
+        self.assertEqual(parse_legacy('1370/01/01'), date(1991, 3, 21))
+        self.assertEqual(parse_legacy('1403-01-01'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy('1402/12/29'), date(2024, 3, 19))
+        self.assertEqual(parse_legacy('1403/12/30'), date(2025, 3, 20))
+        self.assertEqual(parse_legacy('1403/06/31 14:30'), datetime(2024, 9, 21, 14, 30))
+
+    def test_persian_and_arabic_digits(self):
+        self.assertEqual(parse_legacy('۱۴۰۳/۰۱/۰۱'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy('١٤٠٣/٠١/٠١'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy(' ۲۰۲۴-۰۳-۲۰ ۱۰:۰۰ '), datetime(2024, 3, 20, 10, 0))
+
+    def test_rejected(self):
+        for value in [
+            '03/20/2024',  # US month-first
+            '2024-01-01 25:00', '2024-01-01 10:60', '2024-02-30',
+            '1402/12/30',  # Esfand 30 outside a leap year
+            '1403/07/31', '1403/13/01', '', 'yesterday', None, 20240320,
+        ]:
+            with self.subTest(value=value):
+                self.assertIsNone(parse_legacy(value))
+
+    def test_date_and_datetime_views(self):
+        self.assertEqual(parse_legacy_date('1403/01/01 23:59'), date(2024, 3, 20))
+        self.assertEqual(parse_legacy_datetime('1403/01/01'), datetime(2024, 3, 20, tzinfo=timezone.utc))
+        self.assertEqual(
+            parse_legacy_datetime('2024-03-20T10:00:00+03:30'),
+            datetime(2024, 3, 20, 6, 30, tzinfo=timezone.utc),
+        )
+        self.assertIsNone(parse_legacy_datetime('1402/12/30'))
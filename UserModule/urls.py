@@ -1,6 +1,15 @@
 from django.urls import path
-from .views import DynamicAPIView
+from .views import (
+    AccessCheckAPIView, BatchAPIView, DynamicAPIView, FaceIdentifyAPIView, PersonPhotoAPIView, PersonSearchAPIView,
+    TemplateBundleAPIView,
+)
 
 urlpatterns = [
     path('', DynamicAPIView.as_view()),
+    path('batch/', BatchAPIView.as_view()),
+    path('photo/', PersonPhotoAPIView.as_view()),
+    path('search/', PersonSearchAPIView.as_view()),
+    path('access/', AccessCheckAPIView.as_view()),
+    path('templates/', TemplateBundleAPIView.as_view()),
+    path('identify/', FaceIdentifyAPIView.as_view()),
 ]
@@ -1,16 +1,51 @@
+import base64
+import binascii
+import functools
 from datetime import timezone
 
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q
-from .models import GenShift, SecUser, GenPerson, GenPersonRole, GenMember, GenMembershipType
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, Q
+from django.utils.http import parse_etags
+from GymAutomation.pagination import cursor_page
+from GymAutomation.readers import values_reader
+from .access import lookup_card
+from .filters import compile_filters
+from .identification import MAX_MATCHES, identify_face
+from .allocator import allocate_id
+from .batch import MAX_BATCH_OPERATIONS, apply_operations, validate_operations
+from .biometrics import template_bundle
+from .reference import REFERENCE_MODELS, cached_reference, reference_key
+from .search import MIN_QUERY_LENGTH, normalize_search, search_people
+from .models import GenShift, SecUser, GenPerson, GenPersonRole, GenMember, GenMembershipType, PersonThumbnail
+from .photos import PHOTO_MAX_AGE, THUMBNAIL_SIZES, refresh_photo
 from .serializers import (
-    GenShiftSerializer, SecUserSerializer, GenPersonSerializer, GenPersonRoleSerializer,
+    Base64BinaryField, GenShiftSerializer, SecUserSerializer, GenPersonSerializer, GenPersonRoleSerializer,
     GenMemberSerializer, GenMembershipTypeSerializer
 )
 
 
+@functools.cache
+def binary_fields(serializer_class):
+    return {name for name, field in serializer_class().fields.items() if isinstance(field, Base64BinaryField)}
+
+
+@functools.cache
+def field_paths(serializer_class):
+    # Serializer field -> ORM path of its column, e.g. minutiae -> biometrics__minutiae
+    return {name: field.source.replace('.', '__') for name, field in serializer_class().fields.items()}
+
+
+def etag_matches(request, etag):
+    tokens = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in tokens or etag in [token.removeprefix('W/') for token in tokens]
+
+
 class DynamicAPIView(APIView):
     def get_model(self, action):
         if action == 'shift':
@@ -42,28 +77,138 @@ class DynamicAPIView(APIView):
             return GenMembershipTypeSerializer
         return None
 
+    def get_fieldset(self, request, model):
+        # `fields=a,b` keeps only the listed fields and `exclude=a,b` drops them. Without either, list calls
+        # leave out the binary columns (photos, fingerprints, face templates); calls with an id return everything.
+        available = list(self.get_serializer(model).Meta.fields)
+        if 'fields' in request.query_params:
+            requested = [name.strip() for name in request.query_params['fields'].split(',') if name.strip()]
+            if not requested:
+                raise ValueError('fields must name at least one field')
+            selected = requested
+        elif 'exclude' in request.query_params:
+            requested = [name.strip() for name in request.query_params['exclude'].split(',') if name.strip()]
+            selected = [name for name in available if name not in requested]
+        elif request.query_params.get('id'):
+            return available
+        else:
+            requested = []
+            blobs = binary_fields(self.get_serializer(model))
+            selected = [name for name in available if name not in blobs]
+
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return selected
+
+    def get_expansions(self, request, model, fieldset):
+        # `expand=person,shift` inlines those foreign keys as objects, without their binary columns.
+        # Returns {field: related fields}; the related rows are joined in with select_related.
+        requested = [name.strip() for name in request.query_params.get('expand', '').split(',') if name.strip()]
+        paths = field_paths(self.get_serializer(model))
+        expandable = [
+            name for name in fieldset if '__' not in paths[name] and model._meta.get_field(paths[name]).many_to_one
+        ]
+        unknown = [name for name in requested if name not in expandable]
+        if unknown:
+            raise ValueError(f"Cannot expand {', '.join(unknown)}; expandable: {', '.join(expandable) or 'nothing'}")
+        expansions = {}
+        for name in dict.fromkeys(requested):
+            related = self.get_serializer(model._meta.get_field(name).related_model)
+            blobs = binary_fields(related)
+            expansions[name] = [field for field in related.Meta.fields if field not in blobs]
+        return expansions
+
+    def get_expanded_serializers(self, model, expansions):
+        return {
+            name: self.get_serializer(model._meta.get_field(name).related_model)(fields=fields, read_only=True)
+            for name, fields in expansions.items()
+        }
+
     def get(self, request):
         action = request.query_params.get('action')
         model = self.get_model(action)
         if not model:
             return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
+        if model not in REFERENCE_MODELS:
+            return self.read(request, model)
+
+        # Lookup tables are served from the reference cache; clients revalidate with If-None-Match
+        failed = None
+
+        def load():
+            nonlocal failed
+            response = self.read(request, model)
+            if response.status_code != status.HTTP_200_OK:
+                failed = response
+                return None
+            return response.data
+
+        cached = cached_reference(reference_key(model, request.query_params), load)
+        if cached is None:
+            return failed
+        etag, data = cached
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
+
+    def read(self, request, model):
+        try:
+            fieldset = self.get_fieldset(request, model)
+            expansions = self.get_expansions(request, model, fieldset)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
         filters = Q()
         object_id = request.query_params.get('id')
 
         if object_id:
             filters &= Q(id=object_id)
 
-        for key, value in request.query_params.items():
-            if key not in ['action', 'id', 'page', 'limit', 'order_by']:
-                if key == 'full_name':
-                    filters &= Q(full_name__icontains=value)
-                else:
-                    filters &= Q(**{key: value})
+        # Only the filters declared in UserModule.filters are accepted
+        try:
+            filters &= compile_filters(model, [
+                (key, value) for key, value in request.query_params.items()
+                if key not in ['action', 'id', 'page', 'limit', 'order_by', 'cursor', 'count', 'fields', 'exclude',
+                               'expand']
+            ])
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        queryset = model.objects.filter(filters)
+        serializer_class = self.get_serializer(model)
+        if expansions:
+            # Columns that are not serialized are not selected either; expanded objects come in the same query
+            # Fields stored in a one-to-one side table (member templates) are joined in only when selected
+            paths = field_paths(serializer_class)
+            columns = [paths[name] for name in fieldset]
+            columns += [
+                f'{name}__{field_paths(self.get_serializer(model._meta.get_field(name).related_model))[field]}'
+                for name, fields in expansions.items() for field in fields
+            ]
+            side_tables = {path.split('__')[0] for path in columns if '__' in path} - set(expansions)
+            queryset = model.objects.filter(filters).select_related(*side_tables, *expansions).only(*columns)
+            expand = self.get_expanded_serializers(model, expansions)
+
+            def serialize(items):
+                return serializer_class(items, many=True, fields=fieldset, expand=expand).data
+        else:
+            # Plain lists are read as tuples of just the serialized columns, without building model instances
+            reader = values_reader(serializer_class, tuple(sorted(set(fieldset))))
+            queryset = reader.rows(model.objects.filter(filters))
+            serialize = reader.serialize
 
         order_by = request.query_params.get('order_by')
+
+        # Keyset pagination, for deep pages; the total is optional there
+        if 'cursor' in request.query_params:
+            try:
+                items, page = cursor_page(request, queryset, '-id' if order_by == 'latest' else 'id')
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'items': serialize(items), **page})
+
         if order_by == 'latest':
             queryset = queryset.order_by('-id')
         elif order_by == 'earlier':
@@ -82,12 +227,11 @@ class DynamicAPIView(APIView):
         end = start + limit
         paginated_queryset = queryset[start:end]
 
-        serializer = self.get_serializer(model)(paginated_queryset, many=True)
         return Response({
             'total_items': total_items,
             'total_pages': total_pages,
             'current_page': page,
-            'items': serializer.data
+            'items': serialize(paginated_queryset)
         })
 
     def post(self, request):
@@ -98,29 +242,23 @@ class DynamicAPIView(APIView):
 
         data = request.data.copy()
 
-        # If id is not manually set, auto-assign the next free one
+        # If id is not manually set, start from 1; either way the lowest free id from there is used
         if 'id' not in data or data['id'] in [None, '']:
-            # Use the lowest unused ID starting from 1
-            existing_ids = set(model.objects.values_list('id', flat=True))
-            new_id = 1
-            while new_id in existing_ids:
-                new_id += 1
-            data['id'] = new_id
-
+            start = 1
         else:
             try:
-                base_id = int(data['id'])
+                start = int(data['id'])
             except ValueError:
                 return Response({'error': 'Invalid ID format'}, status=status.HTTP_400_BAD_REQUEST)
 
-            while model.objects.filter(id=base_id).exists():
-                base_id += 1
-            data['id'] = base_id
-
-        serializer = self.get_serializer(model)(data=data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        # The id is allocated and the row inserted in one transaction, so concurrent creates get different ids
+        with transaction.atomic():
+            data['id'] = allocate_id(model, start)
+            serializer = self.get_serializer(model)(data=data)
+            if serializer.is_valid():
+                serializer.save()
+                return Response(serializer.data, status=status.HTTP_201_CREATED)
+            transaction.set_rollback(True)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request):
@@ -163,3 +301,187 @@ class DynamicAPIView(APIView):
 
         instance.delete()
         return Response({'message': 'Deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+class BatchAPIView(DynamicAPIView):
+    # Up to MAX_BATCH_OPERATIONS creates/updates/deletes of one `action`, as
+    # {"operations": [{"op": "create", "data": {...}}, {"op": "update", "id": 1, "data": {...}}, {"op": "delete", "id": 2}]}.
+    # Every operation is validated first; if any fails nothing is written, otherwise all are applied in one transaction.
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        action = request.query_params.get('action')
+        model = self.get_model(action)
+        if not model:
+            return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
+
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'operations must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return Response({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # The rows addressed are locked while they are validated and until the batch commits
+            with transaction.atomic():
+                plan, errors = validate_operations(model, self.get_serializer(model), operations)
+                if errors:
+                    return Response(
+                        {'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                results = apply_operations(model, plan)
+        except IntegrityError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response({'results': results})
+
+
+class AccessCheckAPIView(APIView):
+    # Turnstile check-in: resolves a card number from the per-process card cache
+    def get(self, request):
+        card_no = request.query_params.get('card_no')
+        if not card_no:
+            return Response({'error': 'card_no query param required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entry = lookup_card(card_no)
+        if entry is None:
+            return Response({'error': 'Card not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({**entry, 'allowed': not entry['is_black_list']})
+
+
+class PersonPhotoAPIView(APIView):
+    # A person's photo as an image: `id`, plus `size` (one of THUMBNAIL_SIZES) for an AVIF thumbnail and
+    # `v` (the person's photo_digest) for a URL that can be cached for good
+    def get(self, request):
+        object_id = request.query_params.get('id')
+        if not object_id:
+            return Response({'error': 'ID is required'}, status=status.HTTP_400_BAD_REQUEST)
+        size = request.query_params.get('size')
+        if size is not None and size not in [str(s) for s in THUMBNAIL_SIZES]:
+            return Response({'error': f"size must be one of: {', '.join(map(str, THUMBNAIL_SIZES))}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            person = GenPerson.objects.only('photo_digest', 'photo_type', 'photo_updated_at').get(id=object_id)
+        except (GenPerson.DoesNotExist, ValueError):
+            return Response({'error': 'Person not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if person.photo_digest is None:
+            # Photos written by the importer get their thumbnails on first request
+            data = GenPerson.objects.filter(pk=person.pk).values_list('person_image', flat=True).first()
+            if not data:
+                return Response({'error': 'Person has no photo.'}, status=status.HTTP_404_NOT_FOUND)
+            refresh_photo(person.pk, data)
+            person.refresh_from_db(fields=['photo_digest', 'photo_type', 'photo_updated_at'])
+
+        # Conditional requests are answered from the person row alone, without reading the image
+        etag = f'"{person.photo_digest}-{size or "original"}"'
+        last_modified = int(person.photo_updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            if size:
+                image = PersonThumbnail.objects.filter(person_id=person.pk, size=int(size)) \
+                    .values_list('image', flat=True).first()
+                content_type = 'image/avif'
+            else:
+                image = GenPerson.objects.filter(pk=person.pk).values_list('person_image', flat=True).first()
+                content_type = person.photo_type
+            if image is None:
+                return Response({'error': 'No thumbnail for this photo.'}, status=status.HTTP_404_NOT_FOUND)
+            response = HttpResponse(bytes(image), content_type=content_type)
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if request.query_params.get('v') == person.photo_digest:
+            response['Cache-Control'] = f'private, max-age={PHOTO_MAX_AGE}, immutable'
+        else:
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class PersonSearchAPIView(APIView):
+    # Ranked search over name, mobile, national code and membership card numbers, for the front-desk search box
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if len(normalize_search(query)) < MIN_QUERY_LENGTH:
+            return Response({'error': f'q must be at least {MIN_QUERY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = int(request.query_params.get('page', 1))
+            limit = int(request.query_params.get('limit', 10))
+            if page < 1 or limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = search_people(query, (page - 1) * limit, limit)
+
+        blobs = binary_fields(GenPersonSerializer)
+        fields = [name for name in GenPersonSerializer.Meta.fields if name not in blobs]
+        people = (
+            GenPerson.objects.filter(id__in=[person_id for person_id, _ in matches]).only(*fields)
+            .prefetch_related(
+                Prefetch('members', queryset=GenMember.objects.only('id', 'card_no', 'person_id').order_by('id'))
+            )
+        )
+        people = {person.id: person for person in people}
+
+        items = []
+        for person_id, rank in matches:
+            # A person deleted since the search is left out
+            person = people.get(person_id)
+            if person is None:
+                continue
+            item = GenPersonSerializer(person, fields=fields).data
+            item['members'] = [{'id': member.id, 'card_no': member.card_no} for member in person.members.all()]
+            item['rank'] = round(rank, 4)
+            items.append(item)
+
+        return Response({
+            'current_page': page,
+            'items': items
+        })
+
+
+class TemplateBundleAPIView(APIView):
+    # Fingerprint and face templates for turnstile and enrollment devices as one binary bundle (format in
+    # UserModule.biometrics); `since`, the version of the device's last bundle, limits it to what changed
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+                if since < 0:
+                    raise ValueError
+            except ValueError:
+                return Response({'error': 'since must be a non-negative integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        version, chunks = template_bundle(since)
+        response = StreamingHttpResponse(chunks, content_type='application/octet-stream')
+        response['X-Bundle-Version'] = str(version)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class FaceIdentifyAPIView(APIView):
+    # 1:N identification of a base64 face `template` against every member's face templates; returns the
+    # `limit` best matching members with their scores (cosine similarity, 1 is identical)
+    def post(self, request):
+        try:
+            probe = base64.b64decode(request.data.get('template') or '', validate=True)
+        except (binascii.Error, TypeError, ValueError):
+            return Response({'error': 'template must be base64-encoded.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.data.get('limit', 5))
+            if not 1 <= limit <= MAX_MATCHES:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({'error': f'limit must be between 1 and {MAX_MATCHES}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            matches = identify_face(probe, limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'matches': [{'member_id': member_id, 'score': score} for member_id, score in matches]})